@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Engine micro-benchmarks on saved positions.
+
+Each subcommand replays one or more .thud files (default: start.thud and
+open.thud, the positions shipped with the repo) and reports a throughput
+or work-count figure for the side to act:
+
+    python3 bench.py ordering [game.thud ...]   # move-ordering savings
+    python3 bench.py validate [game.thud ...]   # validate_move calls/sec
+
+Numbers go to stdout; engine logging is silenced.
+"""
+
+__author__ = "William Dizon"
+__license__ = "MIT License"
+__version__ = "1.8.0"
+__email__ = "wdchromium@gmail.com"
+
+import itertools
+import logging
+import os
+import sys
+import time
+
+from console import replay
+from thud import AIEngine
+from thud.search import Searcher
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FILES = ('start.thud', 'open.thud')
+USAGE = "usage: bench.py {ordering,validate} [game.thud ...]"
+
+
+def load(path):
+    with open(path) as f:
+        return replay(f.readlines())
+
+
+def all_plies(board, token):
+    """Every legal ply in plain generator order (direction-loop order)."""
+    plies = list(itertools.chain(board.find_caps(token), board.find_moves(token)))
+    if token == 'troll':
+        plies.extend(board.find_materializations())
+    return plies
+
+
+class GenerationOrderSearcher(Searcher):
+    """Searcher without move ordering: the baseline ordered_plies beats."""
+
+    def plies(self, board, side, hint=0):
+        return all_plies(board, side)
+
+
+def bench_ordering(board, name):
+    token = board.turn_to_act()
+    candidates = all_plies(board, token)
+    root = len(board.ply_list)
+    predict_future = AIEngine.predict_future
+    played = []
+
+    def counting_predict_future(b, firstply, lookahead, token):
+        # Only the root's candidates; nested lookahead calls come through
+        # here too.
+        if len(b.ply_list) == root:
+            played.append(firstply)
+        return predict_future(b, firstply, lookahead, token)
+
+    for lookahead in (0, 1):
+        AIEngine.tt.clear()
+        start = time.perf_counter()
+        for p in candidates:
+            predict_future(board, p, lookahead, token)
+        plain = time.perf_counter() - start
+
+        AIEngine.tt.clear()
+        del played[:]
+        AIEngine.predict_future = staticmethod(counting_predict_future)
+        try:
+            start = time.perf_counter()
+            AIEngine.select_best_future(board, candidates, lookahead, token)
+            ordered = time.perf_counter() - start
+        finally:
+            AIEngine.predict_future = staticmethod(predict_future)
+        print('{} {} select_best_future lookahead {}: {} -> {} candidates '
+              'played out ({:.2f}s -> {:.2f}s)'.format(
+                  name, token, lookahead, len(candidates), len(played),
+                  plain, ordered))
+
+    for depth in (1, 2):
+        counts = []
+        for cls in (GenerationOrderSearcher, Searcher):
+            s = cls(depth=depth)
+            start = time.perf_counter()
+            s.best_move(board, token)
+            counts.append((s.nodes, time.perf_counter() - start))
+        print('{} {} search depth {}: {} -> {} nodes ({:.2f}s -> {:.2f}s)'.format(
+            name, token, depth, counts[0][0], counts[1][0],
+            counts[0][1], counts[1][1]))
+
+
+def bench_validate(board, name, seconds=2.0):
+    token = board.turn_to_act()
+    pieces = board.dwarfs if token == 'dwarf' else board.trolls
+    # Every (piece, square) pair, legal or not: the mix the GUI and the
+    # server check, where most probes are rejected.
+    pairs = [(o, d) for o in pieces.positions() for d in board.playable.positions()]
+    validate_move = board.validate_move
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for origin, dest in pairs:
+            validate_move(origin, dest)
+        calls += len(pairs)
+    elapsed = time.perf_counter() - start
+    print('{} {} validate_move: {:.0f} calls/s ({} pairs)'.format(
+        name, token, calls / elapsed, len(pairs)))
+
+
+COMMANDS = {
+    'ordering': bench_ordering,
+    'validate': bench_validate,
+}
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in COMMANDS:
+        print(USAGE, file=sys.stderr)
+        return 2
+    logging.disable(logging.CRITICAL)
+    files = argv[2:] or [os.path.join(REPO_ROOT, f) for f in DEFAULT_FILES]
+    for path in files:
+        COMMANDS[argv[1]](load(path), os.path.basename(path))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
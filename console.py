@@ -38,14 +38,14 @@ def replay(ply_lines):
     """
     board = Gameboard('classic')
     turn = itertools.cycle(['dwarf', 'troll'])
+    ply_lines = list(ply_lines)
 
-    for raw in ply_lines:
+    for raw, ply in zip(ply_lines, Ply.parse_many(ply_lines)):
         move = raw.strip()
         if not move or ',' in move:
             # blank line or comma-delimited saved starting position; ignore.
             continue
 
-        ply = Ply.parse_string(move)
         if not ply:
             # A non-blank, non-position line that fails to parse is a
             # malformed move — report it rather than silently truncating
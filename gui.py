@@ -12,6 +12,8 @@ from thud import (
     NoMoveException,
     Ply,
 )
+from thud.ai_engine import ENGINES
+from thud.mcts import ROLLOUT_POLICIES
 
 import argparse
 import copy
@@ -30,6 +32,10 @@ CPU_POLL_MS = 200
 THINKING_TICK_MS = 500
 # Plies the AI looks ahead when choosing a move (mirrors console.py's LOOKAHEAD).
 LOOKAHEAD = 3
+# The AI's move chooser (see AIEngine.calculate_best_move) and, for 'mcts',
+# its rollout policy. Set from the command line (--engine / --rollout).
+ENGINE = 'heuristic'
+ROLLOUT = 'heuristic'
 
 # Non-compulsory-capture selection states (set on the GUI's selection_mode).
 # SELECT_IDLE: not mid-selection; SELECT_ACTIVE: collecting the dwarfs/trolls
@@ -64,6 +70,8 @@ class DesktopGUI(tkinter.Frame):
         self.cpu_dwarf = tkinter.BooleanVar()
         self.alt_iconset = tkinter.BooleanVar()
         self.lookahead_count = LOOKAHEAD
+        self.engine = ENGINE
+        self.rollout = ROLLOUT
 
         self.draw_ui(master)
         self.user_notice.set("")
@@ -218,8 +226,8 @@ class DesktopGUI(tkinter.Frame):
 
     def update_ui(self):
         """Updates UI piece count, turn indicator, and clears notices."""
-        self.dwarf_count.set("Dwarfs Remaining: " + str(len(self.board.dwarfs)))
-        self.troll_count.set("Trolls Remaining: " + str(len(self.board.trolls)))
+        self.dwarf_count.set("Dwarfs Remaining: " + str(self.board.dwarf_count))
+        self.troll_count.set("Trolls Remaining: " + str(self.board.troll_count))
         side = self.board.turn_to_act().capitalize()
         ruleset = self.board.ruleset.upper() if self.board.ruleset == 'kvt' else self.board.ruleset.capitalize()
         if self.board.game_winner:
@@ -242,22 +250,20 @@ class DesktopGUI(tkinter.Frame):
             return
 
         with open(filename, "r") as thud_file:
-            for line in thud_file:
-                if not line.strip():
-                    continue
-                ply = Ply.parse_string(line)
-                if ply:
-                    imported_plies.append(ply)
+            lines = [line for line in thud_file if line.strip()]
+        for line, ply in zip(lines, Ply.parse_many(lines)):
+            if ply:
+                imported_plies.append(ply)
+            else:
+                # A non-ply line is the saved starting-position header;
+                # its piece count / contents identify the ruleset.
+                piece_list = line.split(',')
+                if len(piece_list) == 41 or len(piece_list) == 40:
+                    self.board.ruleset = 'classic'
+                elif 'dH9' in piece_list:
+                    self.board.ruleset = 'kvt'
                 else:
-                    # A non-ply line is the saved starting-position header;
-                    # its piece count / contents identify the ruleset.
-                    piece_list = line.split(',')
-                    if len(piece_list) == 41 or len(piece_list) == 40:
-                        self.board.ruleset = 'classic'
-                    elif 'dH9' in piece_list:
-                        self.board.ruleset = 'kvt'
-                    else:
-                        self.board.ruleset = 'klash'
+                    self.board.ruleset = 'klash'
 
         self.displayed_ply = 0
         if self.play_out_moves(imported_plies, len(imported_plies) - 1):
@@ -282,8 +288,8 @@ class DesktopGUI(tkinter.Frame):
 
                 f.write(first_string + '\n')
 
-                for k in self.board.ply_list:
-                    f.write(str(k) + '\n')
+                for k in Ply.format_many(self.board.ply_list):
+                    f.write(k + '\n')
         except OSError as e:
             # Previously a bare `except: pass` silently dropped save failures;
             # surface the error to the user instead.
@@ -380,7 +386,7 @@ class DesktopGUI(tkinter.Frame):
             return
 
         ply = Ply('troll', position, position, [])
-        self.board.add_troll(position)
+        self.board.apply_ply(ply)
         self.board.ply_list.append(ply)
         self.notate_move(ply)
         self.sync_sprites()
@@ -526,9 +532,9 @@ class DesktopGUI(tkinter.Frame):
         """Shortcut function to execute all backend updates along with UI sprites"""
         if fullply.origin == fullply.dest and fullply.token == 'troll':
             # Klash materialization: a troll appears on a central square.
-            # There is no origin sprite to move; add_troll updates the board
+            # There is no origin sprite to move; apply_ply updates the board
             # and the materialized-troll count, then rebuild sprites.
-            self.board.add_troll(fullply.dest)
+            self.board.apply_ply(fullply)
             self.board.ply_list.append(fullply)
             self.notate_move(fullply)
             self.displayed_ply = len(self.board.ply_list) - 1
@@ -579,7 +585,7 @@ class DesktopGUI(tkinter.Frame):
                     notate_append(b)
                 elif not valid[0] and not valid[1] and valid[2]:
                     #materializing troll
-                    self.board.add_troll(b.origin)
+                    self.board.apply_ply(Ply('troll', b.origin, b.origin, []))
                     notate_append(b)
             else:
                 notate_append(b)
@@ -628,7 +634,8 @@ class DesktopGUI(tkinter.Frame):
         self.user_notice.set("Computer is thinking...")
         try:
             decision = AIEngine.calculate_best_move(self.board, side,
-                                                    self.lookahead_count)
+                                                    self.lookahead_count,
+                                                    **self.engine_options())
             assert decision
             self.execute_ply(decision)
         except NoMoveException as ex:
@@ -685,15 +692,22 @@ class DesktopGUI(tkinter.Frame):
         snapshot = copy.deepcopy(self.board)
         self.ai_thread = threading.Thread(
             target=self._ai_worker,
-            args=(snapshot, side, self.lookahead_count),
+            args=(snapshot, side, self.lookahead_count, self.engine_options()),
             daemon=True,
         )
         self.ai_thread.start()
 
-    def _ai_worker(self, board_snapshot, side, lookahead):
+    def engine_options(self):
+        """Keyword arguments selecting the AI's engine for calculate_best_move."""
+        if self.engine == 'mcts':
+            return {'engine': 'mcts', 'rollout': self.rollout}
+        return {'engine': self.engine}
+
+    def _ai_worker(self, board_snapshot, side, lookahead, options):
         """Worker-thread entry point. Must not touch Tk widgets."""
         try:
-            decision = AIEngine.calculate_best_move(board_snapshot, side, lookahead)
+            decision = AIEngine.calculate_best_move(board_snapshot, side,
+                                                    lookahead, **options)
             self.ai_queue.put(('ply', decision))
         except NoMoveException as ex:
             self.ai_queue.put(('nomove', ex.token))
@@ -833,11 +847,11 @@ class tkinter_game:
             if not len(ui.board.ply_list) % 10:
                 print('Ply {0}: trolls {1} to dwarf {2}'.format(
                     len(ui.board.ply_list),
-                    len(ui.board.trolls),
-                    len(ui.board.dwarfs)))
+                    ui.board.troll_count,
+                    ui.board.dwarf_count))
         print('{0} win! trolls {1} to dwarf {2}'.format(ui.board.game_winner,
-                                                        len(ui.board.trolls),
-                                                        len(ui.board.dwarfs)))
+                                                        ui.board.troll_count,
+                                                        ui.board.dwarf_count))
         return ui.board.game_winner
 
     def play_game(self):
@@ -852,11 +866,19 @@ def main(argv=None):
         '--simulate', type=int, metavar='N', default=None,
         help='play N headless AI-vs-AI classic games and print the results '
              'instead of launching the interactive GUI (engine-tuning tool)')
+    parser.add_argument(
+        '--engine', choices=ENGINES, default=ENGINE,
+        help="the AI's move chooser; 'mcts' is the strongest "
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--rollout', choices=sorted(ROLLOUT_POLICIES), default=ROLLOUT,
+        help='MCTS rollout policy (default: %(default)s)')
     args = parser.parse_args(argv)
 
     root = tkinter.Tk()
     root.wm_resizable(0, 0)
     ui = DesktopGUI(root)
+    ui.engine, ui.rollout = args.engine, args.rollout
     game = tkinter_game(ui, root)
 
     if args.simulate is not None:
@@ -120,7 +120,7 @@ class GameSession:
                 'thudstone': list(self.board.thudstone.get_bits()),
                 'playable': list(self.board.playable.get_bits()),
             },
-            'ply_list': [str(p) for p in self.board.ply_list],
+            'ply_list': Ply.format_many(self.board.ply_list),
             'turn': self.board.turn_to_act(),
             'winner': self.board.game_winner,
             'ruleset': self.board.ruleset,
@@ -248,10 +248,11 @@ async def _handle_move(ws, data):
     ply = Ply(mover_piece, origin, dest, captured if cap else [])
     GAME.board.apply_ply(ply)
     GAME.board.ply_list.append(ply)
-    # Scored terminal (no move cap for interactive play): ends on rout, KVT
+    # Scored terminal (no move caps for interactive play): ends on rout, KVT
     # objective, klash mobilization, or a stalemate (no legal move -> draw
     # by material), and can report a 'draw'.
-    term = GAME.board.result(max_plies=None)
+    term = GAME.board.result(max_plies=None, max_repetitions=None,
+                             max_quiet_plies=None)
     if term:
         GAME.board.game_winner = term['winner']
 
@@ -78,6 +78,57 @@ class TestCalculateBestMove:
         assert exc.value.token == 'troll'
 
 
+class TestBoardUntouched:
+    """The chooser searches on the caller's board with push/pop; it must
+    hand it back exactly as it found it."""
+
+    def test_calculate_best_move_leaves_board_unchanged(self):
+        g = Gameboard('classic')
+        opener = Ply.parse_string('dO11-O9')
+        g.push(opener)
+        before = g.snapshot()
+        AIEngine.calculate_best_move(g, 'troll', 0)
+        AIEngine.calculate_best_move(g, 'dwarf', 1)
+        assert g.snapshot() == before
+        assert g.ply_list == [opener]
+
+    def test_predict_future_leaves_board_unchanged(self):
+        g = Gameboard('classic')
+        before = g.snapshot()
+        first = next(g.find_moves('dwarf'))
+        AIEngine.predict_future(g, first, 2, 'dwarf')
+        assert g.snapshot() == before
+
+
+class TestSelectBestFuture:
+    def _naive(self, g, plies, lookahead, token):
+        best, best_score = None, -101
+        for p in plies:
+            score = AIEngine.predict_future(g, p, lookahead, token)
+            if score > best_score:
+                best, best_score = p, score
+        return best
+
+    def test_skipping_dominated_candidates_keeps_the_answer(self):
+        g = Gameboard('classic')
+        g.push(Ply.parse_string('dO11-O9'))
+        g.push(Ply.parse_string('TG7-F7'))
+        plies = list(g.find_caps('dwarf')) + list(g.find_moves('dwarf'))
+        skipped = AIEngine.skipped
+        got = AIEngine.select_best_future(g, plies, 0, 'dwarf')
+        assert got == self._naive(g, plies, 0, 'dwarf')
+        # Nothing captures, so everything after the first is dominated.
+        assert AIEngine.skipped - skipped == len(plies) - 1
+
+    def test_capture_is_found_first(self):
+        g = Gameboard('classic')
+        g.dwarfs = Bitboard([Ply.notation_to_position(n) for n in ('D8', 'M3')])
+        g.trolls = Bitboard([Ply.notation_to_position('C8')])
+        plies = list(g.find_moves('dwarf')) + list(g.find_caps('dwarf'))
+        got = AIEngine.select_best_future(g, plies, 0, 'dwarf')
+        assert got.captured == [Ply.notation_to_position('C8')]
+
+
 class TestFilterThreatenedPieces:
     """Regression for the `self.get_direction` typo that previously made
     this method raise AttributeError every time it was called."""
@@ -12,6 +12,7 @@ import pytest
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from thud import bitboard
 from thud.bitboard import Bitboard
 
 
@@ -193,6 +194,45 @@ class TestShifts:
         assert len(shifted) == 0
 
 
+DIRECTIONS = (-18, -17, -16, 16, 17, 18, -1, 1)
+
+
+class TestDirectionalShift:
+    @pytest.mark.parametrize('d', DIRECTIONS)
+    def test_matches_square_arithmetic(self, d):
+        """Every square steps to p + d unless that leaves the board or
+        changes file by more than one."""
+        for p in range(N):
+            shifted = Bitboard([p]).shift(d)
+            q = p + d
+            if 0 <= q < N and abs(q % 17 - p % 17) <= 1:
+                assert shifted == Bitboard([q]), (p, d)
+            else:
+                assert not shifted, (p, d)
+
+    @pytest.mark.parametrize('d', [1, 18, -16])
+    def test_no_wrap_from_last_file(self, d):
+        last_file = Bitboard([r * 17 + 16 for r in range(17)])
+        assert not last_file.shift(d) & Bitboard([r * 17 for r in range(17)])
+
+    @pytest.mark.parametrize('d', [-1, -18, 16])
+    def test_no_wrap_from_first_file(self, d):
+        first_file = Bitboard([r * 17 for r in range(17)])
+        assert not first_file.shift(d) & Bitboard([r * 17 + 16 for r in range(17)])
+
+    def test_chained_steps_walk_a_ray(self):
+        bb = Bitboard([17 * 8 + 1])
+        for _ in range(15):
+            bb = bb.shift(1)
+        assert bb == Bitboard([17 * 8 + 16])
+        assert not bb.shift(1)
+
+    def test_does_not_mutate(self):
+        bb = Bitboard([100])
+        bb.shift(17)
+        assert bb == Bitboard([100])
+
+
 class TestBoolean:
     def test_and_intersection(self):
         a = Bitboard([0, 5, 100])
@@ -270,6 +310,65 @@ class TestGetBits:
         bb = Bitboard.create(MASK)
         assert list(bb.get_bits()) == list(range(N))
 
+    def test_get_bits_ascending_random(self):
+        import random
+        rng = random.Random(1)
+        for _ in range(50):
+            positions = rng.sample(range(N), rng.randint(1, 40))
+            assert list(Bitboard(positions).get_bits()) == sorted(positions)
+
+    def test_positions_matches_get_bits(self):
+        bb = Bitboard([3, 17, 288])
+        assert bb.positions() == (3, 17, 288)
+        assert bb.positions() is bb.positions()
+        assert Bitboard().positions() == ()
+
+    def test_positions_tracks_value(self):
+        bb = Bitboard([3])
+        bb.positions()
+        bb.value = Bitboard([4, 5]).value
+        assert bb.positions() == (4, 5)
+
+
+class TestRawHelpers:
+    def test_bit_matches_bitboard(self):
+        assert bitboard.bit(0) == Bitboard([0]).value
+        assert bitboard.bit(288) == 1
+
+    @pytest.mark.parametrize('p', [-1, N, 10 ** 9])
+    def test_bit_rejects_off_board(self, p):
+        with pytest.raises(ValueError):
+            bitboard.bit(p)
+
+    def test_mask_of(self):
+        assert bitboard.mask_of([1, 40, 288]) == Bitboard([1, 40, 288]).value
+        assert bitboard.mask_of([]) == 0
+        with pytest.raises(ValueError):
+            bitboard.mask_of([-(10 ** 9)])
+
+    def test_is_set(self):
+        v = Bitboard([7]).value
+        assert bitboard.is_set(v, 7) == 1
+        assert bitboard.is_set(v, 8) == 0
+        assert bitboard.is_set(v, -1) == 0
+        assert bitboard.is_set(v, N) == 0
+
+    def test_iter_bits(self):
+        assert list(bitboard.iter_bits(Bitboard([288, 0, 9]).value)) == [0, 9, 288]
+
+    def test_shift_matches_method(self):
+        bb = Bitboard([0, 16, 100, 272, 288])
+        for d in DIRECTIONS:
+            assert bitboard.shift(bb.value, d) == bb.shift(d).value
+
+    def test_dilate(self):
+        corner, centre = 0, 8 * 17 + 8
+        assert sorted(bitboard.iter_bits(bitboard.dilate(bitboard.bit(corner)))) == [1, 17, 18]
+        assert bitboard.dilate(bitboard.bit(centre)) == \
+            Bitboard([centre + d for d in DIRECTIONS]).value
+        # The left edge file doesn't wrap round to the right edge.
+        assert not bitboard.dilate(bitboard.bit(17)) & Bitboard([16, 33]).value
+
 
 class TestEqualityAndHash:
     def test_equal_construction(self):
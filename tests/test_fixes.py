@@ -182,6 +182,33 @@ class TestScoredTerminal:
         assert term['reason'] == 'cutoff'
         assert term['winner'] in ('dwarf', 'troll', 'draw')
 
+    def _shuffle(self, g, times):
+        # A dwarf and a troll step out and back: the start position again.
+        d = next(g.find_moves('dwarf'))
+        t = next(g.find_moves('troll'))
+        for _ in range(times):
+            for p in (d, t, Ply('dwarf', d.dest, d.origin, []),
+                      Ply('troll', t.dest, t.origin, [])):
+                g.push(p)
+
+    def test_repetition_is_scored(self):
+        g = Gameboard('classic')
+        self._shuffle(g, 1)
+        assert g.repetitions() == 2
+        assert g.result() is None
+        self._shuffle(g, 1)
+        term = g.result()
+        assert term['reason'] == 'repetition'
+        assert term['score'] == g.troll_material()
+        assert g.result(max_repetitions=None) is None
+
+    def test_quiet_cutoff(self):
+        g = Gameboard('classic')
+        self._shuffle(g, 1)
+        assert g.quiet_plies == 4
+        assert g.result(max_quiet_plies=4)['reason'] == 'cutoff'
+        assert g.result(max_quiet_plies=5) is None
+
     def test_troll_material_weight_is_4_to_1(self):
         g = Gameboard('classic')
         assert g.troll_material() == 4 * 8 - 32
@@ -194,7 +221,7 @@ class TestSelfPlayTerminates:
         r = selfplay.play_game(ruleset, seed=7, max_plies=80)
         assert r['winner'] in ('dwarf', 'troll', 'draw')
         assert isinstance(r['score'], int)
-        assert r['reason'] in ('win', 'no-move', 'cutoff')
+        assert r['reason'] in ('win', 'no-move', 'cutoff', 'repetition')
 
     def test_classic_seed_1006_no_attributeerror(self):
         # E10: this seed previously crashed at ply 36 with AttributeError.
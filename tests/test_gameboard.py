@@ -9,6 +9,7 @@ import pytest
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from thud import zobrist
 from thud.gameboard import Gameboard
 from thud.bitboard import Bitboard
 from thud.ply import Ply
@@ -77,6 +78,53 @@ class TestTokenAt:
         # F8 is empty in the opening position.
         assert g.token_at(Ply.notation_to_position('F8')) == 'empty'
 
+    def test_off_board_positions(self):
+        g = Gameboard('classic')
+        assert g.token_at(0) is None            # corner: not playable
+        assert g.token_at(-1) is None           # not the last square
+        assert g.token_at(-300) is None
+        assert g.token_at(289) is None
+
+
+def _by_bitboards(g, p):
+    """token_at as it was before the mailbox: straight off the bitboards."""
+    for name, bb in (('troll', g.trolls), ('dwarf', g.dwarfs),
+                     ('thudstone', g.thudstone), ('empty', g.playable)):
+        if bb[p]:
+            return name
+    return None
+
+
+class TestMailbox:
+    def _check(self, g):
+        assert [g.token_at(p) for p in range(289)] == \
+            [_by_bitboards(g, p) for p in range(289)]
+
+    @pytest.mark.parametrize('ruleset', ['classic', 'kvt', 'klash'])
+    def test_tracks_push_pop_and_restore(self, ruleset):
+        from thud import selfplay
+        game = selfplay.play_game(ruleset, seed=5, max_plies=60)
+        g = Gameboard(ruleset)
+        snaps = []
+        for ply in game['ply_list']:
+            snaps.append(g.snapshot())
+            g.push(ply)
+            self._check(g)
+        for _ in range(len(game['ply_list']) // 2):
+            g.pop()
+            self._check(g)
+        g.restore(snaps[3])
+        self._check(g)
+
+    def test_tracks_assignment_and_add_troll(self):
+        g = Gameboard('classic')
+        g.dwarfs = Bitboard([_pos('E5')])
+        self._check(g)
+        g.add_troll(_pos('F6'))
+        assert g.token_at(_pos('F6')) == 'troll'
+        g.playable = Bitboard([_pos('E5'), _pos('G7')])
+        self._check(g)
+
 
 class TestTurnToAct:
     def test_dwarf_starts(self):
@@ -162,6 +210,246 @@ class TestApplyPly:
         assert str(ply) == ply_str_before
 
 
+class TestPushPop:
+    def test_pop_undoes_a_capture(self):
+        g = Gameboard('classic')
+        fresh = Gameboard('classic')
+        f1 = Ply.notation_to_position('F1')
+        g7 = Ply.notation_to_position('G7')
+        f7 = Ply.notation_to_position('F7')
+        ply = Ply('troll', g7, f7, [f1])
+        g.push(ply)
+        assert g.dwarfs[f1] == 0
+        assert g.ply_list == [ply]
+        assert g.pop() is ply
+        assert g.dwarfs == fresh.dwarfs
+        assert g.trolls == fresh.trolls
+        assert g.ply_list == []
+
+    def test_nested_pushes_unwind_in_order(self):
+        g = Gameboard('klash')
+        g.push(Ply('dwarf', _pos('F2'), _pos('F3'), []))
+        g.push(Ply('troll', _pos('G7'), _pos('G7'), []))
+        assert g.klash_trolls == 1
+        g.pop()
+        assert g.klash_trolls == 0
+        assert len(g.trolls) == 0
+        g.pop()
+        assert g.dwarfs == Gameboard('klash').dwarfs
+        assert g.turn_to_act() == 'dwarf'
+
+
+class TestBoardWrappers:
+    def test_wrapper_is_shared_until_the_board_changes(self):
+        g = Gameboard('classic')
+        dwarfs = g.dwarfs
+        assert g.dwarfs is dwarfs
+        g.push(Ply('dwarf', _pos('F1'), _pos('F2'), []))
+        assert g.dwarfs is not dwarfs
+        assert g.dwarfs[_pos('F2')] and not g.dwarfs[_pos('F1')]
+        g.pop()
+        assert g.dwarfs == dwarfs
+
+    def test_assignment_is_copied_in(self):
+        g = Gameboard('classic')
+        bb = Bitboard([_pos('E5')])
+        g.trolls = bb
+        assert g.trolls == bb
+        assert g.token_at(_pos('E5')) == 'troll'
+        assert g.token_at(_pos('G7')) == 'empty'
+
+    def test_occupied_squares(self):
+        g = Gameboard('classic')
+        assert g.occupied_squares() == g.dwarfs | g.trolls | g.thudstone
+
+
+class TestPieceCounts:
+    def _check(self, g):
+        assert g.dwarf_count == len(g.dwarfs)
+        assert g.troll_count == len(g.trolls)
+        assert g.troll_material() == 4 * len(g.trolls) - len(g.dwarfs)
+
+    @pytest.mark.parametrize('ruleset', ['classic', 'klash'])
+    def test_tracked_through_push_pop_and_restore(self, ruleset):
+        from thud import selfplay
+        game = selfplay.play_game(ruleset, seed=4, max_plies=120)
+        assert any(p.captured for p in game['ply_list'])
+        g = Gameboard(ruleset)
+        start = g.snapshot()
+        for ply in game['ply_list']:
+            g.push(ply)
+            self._check(g)
+        end = g.snapshot()
+        while g.ply_list:
+            g.pop()
+            self._check(g)
+        g.restore(end)
+        self._check(g)
+        g.restore(start)
+        self._check(g)
+
+    def test_tracked_through_assignment_and_add_troll(self):
+        g = Gameboard('klash')
+        assert (g.dwarf_count, g.troll_count) == (len(g.dwarfs), 0)
+        g.add_troll(_pos('G7'))
+        g.add_troll(_pos('G7'))  # already there: no new troll
+        self._check(g)
+        g.dwarfs = Bitboard([_pos('E5')])
+        self._check(g)
+        assert g.dwarf_count == 1
+
+    def test_tracked_through_unvalidated_plies(self):
+        # The GUI's allow-illegal replay applies plies like these: a move
+        # from an empty square, and a move onto a piece of the same kind.
+        g = Gameboard('classic')
+        g.push(Ply('dwarf', _pos('H5'), _pos('H6'), []))
+        self._check(g)
+        a, b = g.trolls.positions()[:2]
+        g.push(Ply('troll', a, b, []))
+        self._check(g)
+        assert (g.dwarf_count, g.troll_count) == (33, 7)
+        g.pop()
+        g.pop()
+        self._check(g)
+
+
+class TestRepetitionHistory:
+    @pytest.mark.parametrize('ruleset', ['classic', 'klash'])
+    def test_counts_follow_push_pop_and_restore(self, ruleset):
+        from collections import Counter
+        from thud import selfplay
+        game = selfplay.play_game(ruleset, seed=4, max_plies=120)
+        g = Gameboard(ruleset)
+        keys = [g.zobrist]
+        for ply in game['ply_list']:
+            g.push(ply)
+            keys.append(g.zobrist)
+            assert g.repetitions() == Counter(keys)[g.zobrist]
+            quiet = len(keys) - 1 - max(
+                [i + 1 for i, p in enumerate(g.ply_list) if p.captured] or [0])
+            assert g.quiet_plies == quiet
+        mid = len(keys) // 2
+        while len(g.ply_list) > mid:
+            g.pop()
+        snap = g.snapshot()
+        assert g._seen == Counter(keys[:mid + 1])
+        g.push(game['ply_list'][mid])
+        g.restore(snap)
+        assert g._seen == Counter(keys[:mid + 1])
+        g.restore(Gameboard(ruleset).snapshot())
+        assert g._seen == {keys[0]: 1}
+
+    def test_board_edit_restarts_history(self):
+        g = Gameboard('classic')
+        g.push(next(g.find_moves('dwarf')))
+        g.trolls = Bitboard()
+        assert g._seen == {g.zobrist: 1}
+
+
+class TestZobrist:
+    def test_incremental_key_matches_full_recompute(self):
+        """Replay a long seeded self-play game: after every ply the key
+        apply_ply maintains must equal one computed from scratch."""
+        from thud import selfplay
+        for ruleset in ('classic', 'kvt', 'klash'):
+            game = selfplay.play_game(ruleset, seed=3, max_plies=60)
+            g = Gameboard(ruleset)
+            for ply in game['ply_list']:
+                g.push(ply)
+                assert g.zobrist == zobrist.board_key(g)
+
+    def test_transposition_has_the_same_key(self):
+        a, b = Gameboard('classic'), Gameboard('classic')
+        m1 = Ply('dwarf', _pos('F1'), _pos('F2'), [])
+        m2 = Ply('dwarf', _pos('K1'), _pos('K2'), [])
+        t1 = Ply('troll', _pos('G7'), _pos('F6'), [])
+        t2 = Ply('troll', _pos('J9'), _pos('K10'), [])
+        for p in (m1, t1, m2, t2):
+            a.push(p)
+        for p in (m2, t2, m1, t1):
+            b.push(p)
+        assert a.zobrist == b.zobrist
+
+    def test_side_to_move_changes_the_key(self):
+        g = Gameboard('classic')
+        before = g.zobrist
+        g.ply_list.append('fake')
+        assert zobrist.board_key(g) == before ^ zobrist.SIDE
+
+    def test_pop_and_restore_bring_the_key_back(self):
+        g = Gameboard('klash')
+        key, snap = g.zobrist, g.snapshot()
+        g.push(Ply('dwarf', _pos('F2'), _pos('F3'), []))
+        g.push(Ply('troll', _pos('G7'), _pos('G7'), []))
+        assert g.zobrist == zobrist.board_key(g)
+        g.pop()
+        g.pop()
+        assert g.zobrist == key
+        g.push(Ply('dwarf', _pos('F2'), _pos('F3'), []))
+        g.restore(snap)
+        assert g.zobrist == key
+
+    def test_materialization_as_played_by_the_gui(self):
+        # apply_ply + ply_list.append, as gui.py plays a klash troll.
+        g = Gameboard('klash')
+        for ply in (Ply('dwarf', _pos('F2'), _pos('F3'), []),
+                    Ply('troll', _pos('G7'), _pos('G7'), [])):
+            g.apply_ply(ply)
+            g.ply_list.append(ply)
+        assert g.zobrist == zobrist.board_key(g)
+        assert g.repetitions() == 1
+        assert g.quiet_plies == 2
+
+    def test_direct_assignment_rehashes(self):
+        g = Gameboard('classic')
+        g.trolls = Bitboard()
+        assert g.zobrist == zobrist.board_key(g)
+        assert g.zobrist != Gameboard('classic').zobrist
+
+
+class TestOrderedPlies:
+    class _Hints:
+        def __init__(self, killers=(), history=None):
+            self.killers = list(killers)
+            self.history = history or {}
+
+    def test_same_plies_as_the_generators(self):
+        g = _board(dwarfs=['C8', 'C9', 'L12', 'K7'], trolls=['E8', 'M3'])
+        expected = list(g.find_caps('troll')) + list(g.find_moves('troll'))
+        got = list(g.ordered_plies('troll'))
+        assert sorted(map(str, got)) == sorted(map(str, expected))
+
+    def test_captures_first_biggest_first(self):
+        g = _board(dwarfs=['C8', 'C9', 'L12', 'K7'], trolls=['E8', 'M3'])
+        got = list(g.ordered_plies('troll'))
+        ncaps = [len(p.captured) for p in got]
+        assert ncaps[0] == 2
+        assert ncaps == sorted(ncaps, reverse=True)
+
+    def test_killers_then_history(self):
+        g = _board(dwarfs=['C3'], trolls=['H4'])
+        quiet = list(g.find_moves('troll'))
+        killer, favourite = quiet[5], quiet[3]
+        # A killer from a sibling position: equal by (token, origin, dest).
+        hints = self._Hints([Ply('troll', killer.origin, killer.dest, [])],
+                            {(favourite.token, favourite.origin, favourite.dest): 9})
+        got = list(g.ordered_plies('troll', hints))
+        assert got[0] == killer
+        assert got[1] == favourite
+        assert len(got) == len(quiet)
+
+    def test_illegal_killer_is_ignored(self):
+        g = _board(dwarfs=['C3'], trolls=['H4'])
+        hints = self._Hints([Ply('troll', _pos('A6'), _pos('A7'), [])])
+        assert list(g.ordered_plies('troll', hints)) == list(g.find_moves('troll'))
+
+    def test_orders_a_given_candidate_list(self):
+        g = Gameboard('classic')
+        cands = [Ply('troll', 1, 2, []), Ply('troll', 3, 4, [5]),
+                 Ply('troll', 6, 7, [8, 9])]
+        assert list(g.ordered_plies('troll', plies=cands)) == cands[::-1]
+
+
 class TestValidateMove:
     def test_legal_dwarf_opening(self):
         g = Gameboard('classic')
@@ -187,6 +475,82 @@ class TestValidateMove:
         assert move is False
 
 
+def _caps_by_validate_move(g, token):
+    """Reference find_caps: validate_move on every (piece, square) pair."""
+    pieces = g.dwarfs if token == 'dwarf' else g.trolls
+    caps = []
+    for origin in pieces.positions():
+        for dest in g.playable.positions():
+            _, cap, captured = g.validate_move(origin, dest, False, True)
+            if cap:
+                caps.append((origin, dest, sorted(captured)))
+    return sorted(caps)
+
+
+class TestBitwiseCaps:
+    """find_caps against validate_move on random crowded positions."""
+
+    @pytest.mark.parametrize('ruleset', ['classic', 'klash'])
+    @pytest.mark.parametrize('token', ['dwarf', 'troll'])
+    def test_random_positions(self, ruleset, token):
+        import random
+        rng = random.Random(ruleset + token)
+        for _ in range(40):
+            g = Gameboard(ruleset)
+            free = [p for p in g.playable.positions() if not g.thudstone[p]]
+            squares = rng.sample(free, 60)
+            g.dwarfs = Bitboard(squares[:rng.randint(5, 55)])
+            g.trolls = Bitboard(squares[len(g.dwarfs):])
+            caps = [(p.origin, p.dest, sorted(p.captured)) for p in g.find_caps(token)]
+            assert sorted(caps) == _caps_by_validate_move(g, token)
+            assert all(p.token == token for p in g.find_caps(token))
+
+    def test_troll_shove_needs_the_whole_line(self):
+        # Two trolls behind E8 let it shove two squares to C8, not three.
+        g = _board(dwarfs=['B7'], trolls=['E8', 'F8', 'G8'])
+        caps = {(p.origin, p.dest): p.captured for p in g.find_caps('troll')}
+        assert caps[(_pos('E8'), _pos('C8'))] == [_pos('B7')]
+        g = _board(dwarfs=['A7'], trolls=['E8', 'F8'])
+        assert not any(p.dest == _pos('B8') for p in g.find_caps('troll'))
+
+    def test_dwarf_hurl_needs_the_whole_line(self):
+        # D8 heads a line of three: it can hurl three squares to G8.
+        g = _board(dwarfs=['D8', 'C8', 'B8'], trolls=['G8'])
+        assert [(p.origin, p.dest, p.captured) for p in g.find_caps('dwarf')] == \
+            [(_pos('D8'), _pos('G8'), [_pos('G8')])]
+        g = _board(dwarfs=['D8', 'C8'], trolls=['G8'])
+        assert list(g.find_caps('dwarf')) == []
+
+
+class TestHasLegalMove:
+    def _by_generators(self, g, token):
+        plies = list(g.find_caps(token)) + list(g.find_moves(token))
+        if token == 'troll':
+            plies += list(g.find_materializations())
+        return bool(plies)
+
+    @pytest.mark.parametrize('ruleset', ['classic', 'kvt', 'klash'])
+    def test_matches_generators_on_crowded_boards(self, ruleset):
+        import random
+        rng = random.Random(ruleset)
+        for _ in range(60):
+            g = Gameboard(ruleset)
+            free = [p for p in g.playable.positions() if not g.thudstone[p]]
+            squares = rng.sample(free, rng.randint(len(free) - 12, len(free)))
+            g.dwarfs = Bitboard(squares[:len(squares) // 2])
+            g.trolls = Bitboard(squares[len(squares) // 2:])
+            for token in ('dwarf', 'troll'):
+                assert g.has_legal_move(token) == self._by_generators(g, token)
+
+    def test_boxed_in_dwarf_can_still_hurl(self):
+        # Every square round F8 is taken, but the troll on G8 is a capture.
+        g = _board(dwarfs=['F8', 'E7', 'E8', 'E9', 'F7', 'F9', 'G7', 'G9'],
+                   trolls=['G8'])
+        g.playable = g.dwarfs | g.trolls
+        assert g.has_legal_move('dwarf')
+        assert not g.has_legal_move('troll')
+
+
 class TestWinConditions:
     def test_dwarf_wins_when_trolls_routed(self):
         g = Gameboard('classic')
@@ -204,6 +568,36 @@ class TestWinConditions:
         g = Gameboard('classic')
         assert g.get_game_outcome() is None
 
+    def test_klash_dwarfs_win_when_mobilized(self):
+        g = Gameboard('klash')
+        g.ply_list.append('fake')  # troll's turn
+        assert g.get_game_outcome() is None
+        g.dwarfs = Bitboard([_pos(n) for n in ('E8', 'F8', 'G9', 'G10')])
+        assert g.get_game_outcome() == 'dwarf'
+        g.dwarfs = Bitboard([_pos(n) for n in ('E8', 'F8', 'G10')])
+        assert g.get_game_outcome() is None
+
+
+class TestConnectedComponents:
+    def test_groups_in_position_order(self):
+        g = Gameboard('classic')
+        groups = g.connected_components(
+            Bitboard([_pos(n) for n in ('E8', 'F9', 'K8', 'L7', 'C3')]))
+        assert groups == [Bitboard([_pos('C3')]),
+                          Bitboard([_pos('L7'), _pos('K8')]),
+                          Bitboard([_pos('E8'), _pos('F9')])]
+
+    def test_empty_and_default_armies(self):
+        g = Gameboard('classic')
+        assert g.connected_components(Bitboard()) == []
+        groups = g.connected_components(g.dwarfs)
+        assert len(groups) == 4
+        assert sum(len(c) for c in groups) == len(g.dwarfs)
+
+    def test_does_not_wrap_between_edge_files(self):
+        g = Gameboard('classic')
+        assert len(g.connected_components(Bitboard([16, 17]))) == 2
+
 
 class TestReplayFixture:
     """Replay a real .thud fixture move-by-move."""
@@ -0,0 +1,109 @@
+"""Tests for the UCT engine: legal, reproducible answers, the board is
+restored after every playout, and budgets/policies are honoured."""
+
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from thud import ai_engine, mcts
+from thud.ai_engine import AIEngine
+from thud.bitboard import Bitboard
+from thud.gameboard import Gameboard
+from thud.mcts import MCTS, heuristic_policy, random_policy
+from thud.ply import NoMoveException, Ply
+
+
+def _pos(notation):
+    return Ply.notation_to_position(notation)
+
+
+def _board(dwarfs=(), trolls=()):
+    g = Gameboard('classic')
+    g.dwarfs = Bitboard([_pos(n) for n in dwarfs])
+    g.trolls = Bitboard([_pos(n) for n in trolls])
+    return g
+
+
+class TestMCTS:
+    def test_takes_the_free_troll(self):
+        g = _board(dwarfs=['D8', 'M3'], trolls=['C8', 'K12'])
+        ply = MCTS(playouts=60, rollout_depth=0).best_move(g, 'dwarf')
+        assert ply.captured == [_pos('C8')]
+
+    def test_board_is_restored(self):
+        g = Gameboard('classic')
+        g.push(Ply.parse_string('dO11-O9'))
+        before = g.snapshot()
+        MCTS(playouts=10, rollout_depth=2).best_move(g, 'troll')
+        assert g.snapshot() == before
+        assert len(g.ply_list) == 1
+
+    def test_seeded_runs_agree(self):
+        g = _board(dwarfs=['D8', 'E9', 'M3'], trolls=['C10', 'K12'])
+        picks = []
+        for _ in range(2):
+            ai_engine.seed(5)
+            picks.append(MCTS(playouts=30, rollout_depth=3).best_move(g, 'dwarf'))
+        assert picks[0] == picks[1]
+
+    def test_playout_budget(self):
+        g = _board(dwarfs=['D8', 'M3'], trolls=['C10'])
+        tree = MCTS(playouts=7, rollout_depth=1)
+        tree.best_move(g, 'dwarf')
+        assert tree.completed == 7
+
+    def test_time_budget(self):
+        g = _board(dwarfs=['D8', 'M3'], trolls=['C10'])
+        tree = MCTS(playouts=None, time_budget_ms=50, rollout_depth=1)
+        assert g.dwarfs[tree.best_move(g, 'dwarf').origin] == 1
+        assert tree.completed >= 1
+
+    def test_no_move_raises(self):
+        g = _board(dwarfs=['D8'])
+        with pytest.raises(NoMoveException):
+            MCTS(playouts=5).best_move(g, 'troll')
+
+    def test_policies(self):
+        import random
+        g = _board(dwarfs=['D8', 'M3'], trolls=['C8'])
+        assert g.dwarfs[random_policy(g, 'dwarf', random.Random(1)).origin] == 1
+        assert heuristic_policy(g, 'dwarf', None).captured == [_pos('C8')]
+        with pytest.raises(ValueError):
+            MCTS(rollout='psychic')
+
+
+class TestCalculateBestMoveMCTS:
+    def test_mcts_engine_with_time_budget(self):
+        g = Gameboard('classic')
+        g.push(Ply.parse_string('dO11-O9'))
+        m = AIEngine.calculate_best_move(g, 'troll', engine='mcts',
+                                         time_budget_ms=100)
+        assert g.trolls[m.origin] == 1
+
+    def test_heuristic_rollout_and_options_reach_the_tree(self, monkeypatch):
+        calls = []
+
+        def spy(board, side, rng):
+            calls.append(side)
+            return heuristic_policy(board, side, rng)
+
+        monkeypatch.setitem(mcts.ROLLOUT_POLICIES, 'heuristic', spy)
+        g = Gameboard('classic')
+        g.push(Ply.parse_string('dO11-O9'))
+        m = AIEngine.calculate_best_move(g, 'troll', engine='mcts',
+                                         rollout='heuristic', playouts=3,
+                                         rollout_depth=2)
+        assert g.trolls[m.origin] == 1
+        # Three playouts of at most two rollout plies each, all heuristic.
+        assert 0 < len(calls) <= 6
+
+    def test_mcts_options_need_the_mcts_engine(self):
+        with pytest.raises(ValueError):
+            AIEngine.calculate_best_move(Gameboard('classic'), 'dwarf',
+                                         rollout='heuristic')
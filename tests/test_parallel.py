@@ -0,0 +1,128 @@
+"""Tests for root-parallel scoring: boards rebuilt from snapshots match the
+original, and pooled answers match the serial loops."""
+
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from thud import ai_engine, parallel
+from thud.ai_engine import AIEngine
+from thud.bitboard import Bitboard
+from thud.gameboard import Gameboard
+from thud.ply import Ply
+from thud.search import MoveHints, Searcher
+
+
+@pytest.fixture(scope='module', autouse=True)
+def _pool():
+    yield
+    parallel.shutdown()
+
+
+def _played(ruleset='classic', plies=6, seed=3):
+    g = Gameboard(ruleset)
+    ai_engine.seed(seed)
+    for _ in range(plies):
+        token = g.turn_to_act()
+        ply = AIEngine.calculate_best_move(g, token, 0)
+        g.apply_ply(ply)
+        g.ply_list.append(ply)
+    return g
+
+
+class TestFromSnapshot:
+    @pytest.mark.parametrize('ruleset', ['classic', 'kvt', 'klash'])
+    def test_round_trip(self, ruleset):
+        g = _played(ruleset)
+        r = Gameboard.from_snapshot(ruleset, g.snapshot(), g.ply_list[-1])
+        assert r.snapshot() == g.snapshot()
+        assert r.turn_to_act() == g.turn_to_act()
+        assert sorted(map(str, r.find_caps(r.turn_to_act()))) == \
+            sorted(map(str, g.find_caps(g.turn_to_act())))
+
+    def test_fresh_board(self):
+        g = Gameboard('classic')
+        r = Gameboard.from_snapshot('classic', g.snapshot())
+        assert r.snapshot() == g.snapshot()
+        assert r.ply_list == []
+
+
+class TestParallel:
+    def test_pool_is_reused(self):
+        pool = parallel.get_pool(2)
+        assert parallel.get_pool(2) is pool
+        assert parallel.get_pool(3) is not pool
+
+    @pytest.mark.parametrize('chunksize', [None, 1, 1000])
+    def test_lookahead_0_matches_serial(self, chunksize):
+        g = _played()
+        token = g.turn_to_act()
+        plies = list(g.find_caps(token)) + list(g.find_moves(token))
+        serial = AIEngine.select_best_future(g, plies, 0, token)
+        pooled = parallel.select_best_future(g, plies, 0, token, 2, chunksize)
+        assert pooled == serial
+
+    def test_hints_order_ties_as_serial(self):
+        # Quiet moves all score the same at lookahead 0, so the first in
+        # order wins: the hinted killer, in both paths.
+        g = _played()
+        token = g.turn_to_act()
+        plies = list(g.find_moves(token))
+        hints = MoveHints(killers=[plies[-1]])
+        serial = AIEngine.select_best_future(g, plies, 0, token, hints)
+        pooled = AIEngine.select_best_future(g, plies, 0, token, hints,
+                                             workers=2)
+        assert serial == plies[-1]
+        assert pooled == serial
+
+    def test_seeded_result_independent_of_worker_count(self):
+        g = _played()
+        token = g.turn_to_act()
+        plies = list(g.find_caps(token)) + list(g.find_moves(token))[:12]
+        answers = []
+        for workers in (1, 3):
+            ai_engine.seed(5)
+            answers.append(parallel.select_best_future(g, plies, 1, token,
+                                                       workers, chunksize=4))
+        assert answers[0] == answers[1]
+
+    def test_default_chunksize_independent_of_worker_count(self):
+        # Quiet moves only, so the playouts' random choices decide the pick.
+        g = _played(plies=12)
+        token = g.turn_to_act()
+        plies = list(g.find_moves(token))[:24]
+        answers = []
+        for workers in (1, 4):
+            picks = []
+            for seed in range(6):
+                ai_engine.seed(seed)
+                picks.append(parallel.select_best_future(g, plies, 2, token,
+                                                         workers))
+            answers.append(picks)
+        assert answers[0] == answers[1]
+
+    def test_board_untouched(self):
+        g = _played()
+        snap = g.snapshot()
+        AIEngine.calculate_best_move(g, g.turn_to_act(), 1, workers=2)
+        assert g.snapshot() == snap
+
+    def test_calculate_best_move_matches_serial(self):
+        g = _played(plies=7)
+        assert g.turn_to_act() == 'troll'
+        assert AIEngine.calculate_best_move(g, 'troll', 0, workers=2) == \
+            AIEngine.calculate_best_move(g, 'troll', 0)
+
+    def test_search_matches_serial(self):
+        g = Gameboard('classic')
+        g.dwarfs = Bitboard([Ply.notation_to_position(n)
+                             for n in ('D8', 'E8', 'M3', 'G12')])
+        g.trolls = Bitboard([Ply.notation_to_position(n) for n in ('C8', 'K12')])
+        _, score = parallel.search_best_move(g, 'dwarf', 2, workers=2)
+        assert score == Searcher(depth=2).best_move(g, 'dwarf')[1]
@@ -0,0 +1,73 @@
+"""Perft node counts from the start positions and the shipped games.
+
+The counts were taken before the move generators went bitwise; a change
+here means a generator now produces different plies."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thud import perft
+from thud.gameboard import Gameboard
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('ruleset, counts', [
+    ('classic', [1, 656, 22624]),
+    ('kvt', [1, 384, 17614]),
+    ('klash', [1, 496, 3936]),
+])
+def test_start_positions(ruleset, counts):
+    g = Gameboard(ruleset)
+    assert [perft.perft(g, d) for d in range(3)] == counts
+
+
+@pytest.mark.parametrize('name, counts', [
+    ('start.thud', [32, 19958]),
+    ('open.thud', [552, 30698]),
+])
+def test_game_files(name, counts):
+    g = perft.load(os.path.join(REPO_ROOT, name))
+    assert [perft.perft(g, d) for d in (1, 2)] == counts
+
+
+def test_board_is_left_unchanged():
+    g = perft.load(os.path.join(REPO_ROOT, 'open.thud'))
+    before = (g.snapshot(), list(g.ply_list))
+    perft.perft(g, 2)
+    assert (g.snapshot(), list(g.ply_list)) == before
+
+
+def test_divide_sums_to_perft():
+    g = Gameboard('klash')
+    counts = perft.divide(g, 2)
+    assert len(counts) == perft.perft(g, 1)
+    assert sum(n for _, n in counts) == perft.perft(g, 2)
+
+
+def test_decided_position_is_a_leaf():
+    g = Gameboard('classic')
+    g.trolls = type(g.trolls)()
+    g.ply_list.append('fake')  # troll's turn, and routed
+    assert perft.perft(g, 2) == 0
+    assert perft.divide(g, 2) == []
+
+
+def test_load_rejects_garbage(tmp_path):
+    path = tmp_path / 'bad.thud'
+    path.write_text('dO11-O9\nnot a move\n')
+    with pytest.raises(ValueError):
+        perft.load(str(path))
+
+
+def test_cli(capsys):
+    assert perft.main(['--depth', '1', '--ruleset', 'klash']) == 0
+    assert 'klash depth 1: 496 nodes' in capsys.readouterr().out
+    assert perft.main(['--depth', '1', '--divide',
+                       os.path.join(REPO_ROOT, 'start.thud')]) == 0
+    out = capsys.readouterr().out.splitlines()
+    assert len(out) == 33 and out[-1].endswith('depth 1: 32 nodes')
@@ -28,6 +28,22 @@ class TestNotationConversion:
             t = Ply.position_to_tuple(pos)
             assert Ply.tuple_to_position(t) == pos
 
+    def test_tables_match_arithmetic(self):
+        from thud import ply
+        for pos in range(289):
+            file, rank = Ply.position_to_tuple(pos)
+            if 1 <= file <= 15 and 1 <= rank <= 15:
+                notation = Ply.to_letter[file] + str(rank)
+                assert Ply.position_to_notation(pos) == notation
+                assert Ply.notation_to_position(notation) == pos
+            else:
+                assert ply._NOTATIONS[pos] is None
+                with pytest.raises(ValueError):
+                    Ply.position_to_notation(pos)
+        for pos in (-1, -18, 289, 10 ** 6):
+            with pytest.raises(ValueError):
+                Ply.position_to_notation(pos)
+
     def test_default_dwarf_positions_use_notation(self):
         """Cross-check: dF1 in start.thud should resolve to the F1 position."""
         # Per the README, dF1 is one of the default dwarf squares.
@@ -66,6 +82,20 @@ class TestParseString:
         b = Ply.parse_string('d F1-G2')
         assert a == b
 
+    def test_cached_parse_returns_a_fresh_ply(self):
+        p = Ply.parse_string('TG7-F7xE7')
+        p.captured.append(0)
+        p.score = 5
+        q = Ply.parse_string('TG7-F7xE7')
+        assert q is not p
+        assert str(q) == 'TG7-F7xE7' and q.score == -100
+
+    def test_str_follows_captures_changed_after_formatting(self):
+        p = Ply.parse_string('TG7-F7')
+        assert str(p) == 'TG7-F7'
+        p.captured.append(Ply.notation_to_position('E7'))
+        assert str(p) == 'TG7-F7xE7'
+
     def test_unparseable_returns_none(self):
         assert Ply.parse_string('not a ply') is None
         assert Ply.parse_string('') is None
@@ -79,6 +109,26 @@ class TestParseString:
         assert str(ply) == notation
 
 
+class TestBatchCodec:
+    LINES = ['dF1-G2\n', 'TG7-F7xE7xF6', 'R H8-H9', '', 'dF1,dG1,TG7',
+             'garbage', 'dF1-G16', '  dA15-P1xP1  \n']
+
+    def test_parse_many_matches_parse_string(self):
+        plies = Ply.parse_many(self.LINES)
+        assert len(plies) == len(self.LINES)
+        for line, p in zip(self.LINES, plies):
+            q = Ply.parse_string(line)
+            assert (p is None) == (q is None), line
+            if q is not None:
+                assert (p.token, p.origin, p.dest, p.captured) == \
+                    (q.token, q.origin, q.dest, q.captured)
+
+    def test_format_many(self):
+        plies = [p for p in Ply.parse_many(self.LINES) if p]
+        assert Ply.format_many(plies) == [str(p) for p in plies]
+        assert Ply.format_many([]) == []
+
+
 class TestEquality:
     def test_structural_equality(self):
         a = Ply.parse_string('dF1-G2')
@@ -116,6 +166,36 @@ class TestEquality:
         assert len(s) == 2
 
 
+class TestMoveCodes:
+    def test_multi_capture(self):
+        p = Ply('troll', 120, 121, [103, 139, 122])
+        assert Ply.from_code(p.to_code()) == p
+
+    def test_thudstone(self):
+        p = Ply('thudstone', 144, 145, [])
+        assert Ply.from_code(p.to_code()) == p
+
+    def test_encode_matches_to_code(self):
+        p = Ply('dwarf', 18, 52, [52])
+        assert Ply.encode('dwarf', 18, 52, [52]) == p.to_code() != 0
+
+    def test_generators_can_yield_codes(self):
+        from thud.gameboard import Gameboard
+        for ruleset in ('classic', 'kvt'):
+            g = Gameboard(ruleset)
+            g.push(Ply('dwarf', Ply.notation_to_position('F1'),
+                       Ply.notation_to_position('F6'), []))
+            g.push(Ply('troll', Ply.notation_to_position('G7'),
+                       Ply.notation_to_position('F7'), []))
+            for find in (g.find_moves, g.find_caps):
+                plies = list(find('dwarf'))
+                assert list(find('dwarf', codes=True)) == [p.to_code() for p in plies]
+
+    def test_slots(self):
+        with pytest.raises(AttributeError):
+            Ply('dwarf', 18, 35).note = 'x'
+
+
 class TestBool:
     def test_truthy_for_real_ply(self):
         assert bool(Ply.parse_string('dF1-G2'))
@@ -0,0 +1,67 @@
+"""Tests for the precomputed ray tables: rays follow the grid without
+wrapping, and the lookups agree with the (file, rank) arithmetic that
+Gameboard used before."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thud import rays
+from thud.bitboard import N, Bitboard
+from thud.gameboard import Gameboard
+from thud.ply import Ply
+
+
+def _walk(p, d):
+    """Reference: step from p until the next square is off the grid or
+    changes file by more than one (a wrap)."""
+    out = []
+    while True:
+        q = p + d
+        if not 0 <= q < N or abs(q % 17 - p % 17) > 1:
+            return out
+        out.append(q)
+        p = q
+
+
+class TestTables:
+    @pytest.mark.parametrize('d', rays.DIRECTIONS)
+    def test_rays_match_walk(self, d):
+        for p in range(N):
+            assert rays.RAYS[d][p] == tuple(_walk(p, d)), (p, d)
+            assert rays.RAY_MASKS[d][p] == Bitboard(_walk(p, d)).value
+
+    def test_directions_match_gameboard(self):
+        assert rays.DIRECTIONS == tuple(Gameboard().cycle_direction())
+
+    def test_neighbours(self):
+        corner = Ply.tuple_to_position((0, 0))
+        centre = Ply.tuple_to_position((8, 8))
+        assert len(rays.NEIGHBOURS[corner]) == 3
+        assert rays.NEIGHBOURS[centre] == tuple(centre + d for d in rays.DIRECTIONS)
+        assert rays.NEIGHBOUR_MASKS[centre] == Bitboard(rays.NEIGHBOURS[centre]).value
+
+
+class TestLookups:
+    def test_direction_matches_delta_arithmetic(self):
+        g = Gameboard()
+        for origin in range(0, N, 7):
+            for dest in range(N):
+                delta = g.get_delta(Ply.position_to_tuple(origin),
+                                    Ply.position_to_tuple(dest))
+                assert rays.direction(origin, dest) == g.delta_to_direction(delta)
+
+    def test_steps(self):
+        a = Ply.notation_to_position('C3')
+        assert rays.steps(a, Ply.notation_to_position('C9')) == 6
+        assert rays.steps(a, Ply.notation_to_position('H8')) == 5
+        assert rays.steps(a, Ply.notation_to_position('D5')) is None
+        assert rays.steps(a, a) is None
+
+    def test_get_range_along_a_diagonal(self):
+        g = Gameboard('classic')
+        assert g.get_range(Ply.notation_to_position('F1'),
+                           Ply.notation_to_position('H3')) == ['dwarf', 'empty', 'empty']
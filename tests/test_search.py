@@ -0,0 +1,152 @@
+"""Tests for the alpha-beta Searcher: it must agree with plain minimax,
+find obvious captures, leave the board untouched, and plug into
+AIEngine.calculate_best_move."""
+
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from thud.ai_engine import AIEngine
+from thud.bitboard import Bitboard
+from thud.gameboard import Gameboard
+from thud.ply import NoMoveException, Ply
+from thud.search import WIN_SCORE, Searcher, dwarf_cohesion
+
+
+def _pos(notation):
+    return Ply.notation_to_position(notation)
+
+
+def _board(dwarfs=(), trolls=(), troll_to_move=False):
+    g = Gameboard('classic')
+    if troll_to_move:
+        # Before the assignments below, so the key they derive has the
+        # troll to move.
+        g.ply_list.append(Ply('dwarf', _pos('F1'), _pos('F2'), []))
+    g.dwarfs = Bitboard([_pos(n) for n in dwarfs])
+    g.trolls = Bitboard([_pos(n) for n in trolls])
+    return g
+
+
+def _minimax(searcher, board, side, depth):
+    """Reference: full-width negamax with no pruning and no table."""
+    winner = board.get_game_outcome()
+    if winner:
+        return WIN_SCORE if winner == side else -WIN_SCORE
+    if depth == 0:
+        return searcher.evaluate(board, side)
+    plies = searcher.plies(board, side)
+    if not plies:
+        return searcher.evaluate(board, side)
+    other = 'dwarf' if side == 'troll' else 'troll'
+    best = -WIN_SCORE - 1
+    for p in plies:
+        board.push(p)
+        best = max(best, -_minimax(searcher, board, other, depth - 1))
+        board.pop()
+    return best
+
+
+class TestSearcher:
+    def test_alpha_beta_matches_minimax(self):
+        g = _board(dwarfs=['D8', 'E8', 'C10', 'L7'], trolls=['B8', 'G9'])
+        for depth in (1, 2):
+            s = Searcher(depth=depth)
+            ply, score = s.best_move(g, 'dwarf')
+            assert score == _minimax(Searcher(), g, 'dwarf', depth)
+
+    def test_dwarf_takes_the_free_troll(self):
+        g = _board(dwarfs=['D8', 'M3'], trolls=['C8', 'K12'])
+        ply, score = Searcher(depth=1).best_move(g, 'dwarf')
+        assert ply.captured == [_pos('C8')]
+
+    def test_troll_prefers_the_bigger_shove(self):
+        g = _board(dwarfs=['C8', 'C9', 'L12'], trolls=['E8'], troll_to_move=True)
+        ply, score = Searcher(depth=1).best_move(g, 'troll')
+        assert sorted(ply.captured) == sorted([_pos('C8'), _pos('C9')])
+
+    def test_board_is_left_unchanged(self):
+        g = Gameboard('classic')
+        g.push(Ply.parse_string('dO11-O9'))
+        before = g.snapshot()
+        Searcher(depth=2).best_move(g, 'troll')
+        assert g.snapshot() == before
+
+    def test_no_move_raises(self):
+        g = _board(dwarfs=['D8'], trolls=[])
+        g.dwarfs = Bitboard()
+        with pytest.raises(NoMoveException):
+            Searcher(depth=1).best_move(g, 'troll')
+
+    def test_terms_are_pluggable(self):
+        g = Gameboard('classic')
+        assert Searcher(terms=()).evaluate(g, 'troll') == 0
+        s = Searcher(terms=((1, lambda b: 2.5),))
+        assert s.evaluate(g, 'troll') == 250
+        assert s.evaluate(g, 'dwarf') == -250
+
+    def test_cohesion_counts_adjacent_dwarf_pairs(self):
+        g = _board(dwarfs=['D8', 'E8', 'E9', 'L3'])
+        assert dwarf_cohesion(g) == -3
+
+
+class TestCalculateBestMoveSearch:
+    def test_search_engine_returns_a_legal_move(self):
+        g = Gameboard('classic')
+        g.push(Ply.parse_string('dO11-O9'))
+        m = AIEngine.calculate_best_move(g, 'troll', 0, engine='search')
+        assert m.token == 'troll'
+        assert g.trolls[m.origin] == 1
+
+    def test_unknown_engine_rejected(self):
+        with pytest.raises(ValueError):
+            AIEngine.calculate_best_move(Gameboard('classic'), 'dwarf', 0,
+                                         engine='oracle')
+        with pytest.raises(ValueError):
+            AIEngine.calculate_best_move(Gameboard('classic'), 'dwarf', 0,
+                                         engine='oracle', time_budget_ms=50)
+
+    @pytest.mark.parametrize('kw', [
+        {'time_budget_ms': 50},
+        {'engine': 'search', 'time_budget_ms': 50, 'workers': 2},
+        {'engine': 'mcts', 'workers': 2},
+    ])
+    def test_unsupported_combinations_rejected(self, kw):
+        with pytest.raises(ValueError):
+            AIEngine.calculate_best_move(Gameboard('classic'), 'dwarf', 0, **kw)
+
+
+class TestIterativeDeepening:
+    def test_answers_within_budget(self):
+        import time
+        g = Gameboard('classic')
+        g.push(Ply.parse_string('dO11-O9'))
+        before = g.snapshot()
+        start = time.perf_counter()
+        m = AIEngine.calculate_best_move(g, 'troll', engine='search',
+                                         time_budget_ms=200)
+        # Overshoot is bounded by one node's move generation.
+        assert time.perf_counter() - start < 1.0
+        assert g.trolls[m.origin] == 1
+        assert g.snapshot() == before
+
+    def test_zero_budget_still_returns_a_legal_ply(self):
+        g = Gameboard('classic')
+        s = Searcher()
+        ply, score = s.iterative_deepening(g, 'dwarf', 0)
+        assert s.completed_depth == 0
+        assert score is None
+        assert g.dwarfs[ply.origin] == 1
+
+    def test_completed_iteration_matches_fixed_depth(self):
+        g = _board(dwarfs=['D8', 'E8', 'C10', 'L7'], trolls=['B8', 'G9'])
+        s = Searcher()
+        ply, score = s.iterative_deepening(g, 'dwarf', 10000, max_depth=2)
+        assert s.completed_depth == 2
+        assert score == Searcher(depth=2).best_move(g, 'dwarf')[1]
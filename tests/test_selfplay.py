@@ -0,0 +1,56 @@
+"""Tests for the self-play farm: pooled games are the same games as serial
+ones, results stream back per seed, and the CLI prints one line per game."""
+
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from thud import parallel, selfplay
+
+
+@pytest.fixture(scope='module', autouse=True)
+def _pool():
+    yield
+    parallel.shutdown()
+
+
+def _moves(r):
+    return [str(p) for p in r['ply_list']]
+
+
+class TestPlaySet:
+    def test_serial_is_in_seed_order(self):
+        rs = list(selfplay.iter_games(3, base_seed=10, max_plies=10))
+        assert [r['seed'] for r in rs] == [10, 11, 12]
+
+    def test_workers_match_serial(self):
+        serial = selfplay.play_set(4, base_seed=5, max_plies=24)
+        pooled = selfplay.play_set(4, base_seed=5, max_plies=24, workers=2)
+        assert [r['seed'] for r in pooled] == [5, 6, 7, 8]
+        assert [_moves(r) for r in pooled] == [_moves(r) for r in serial]
+        assert [r['score'] for r in pooled] == [r['score'] for r in serial]
+
+    def test_streams_every_seed_once(self):
+        rs = list(selfplay.iter_games(5, 'kvt', 0, workers=2, max_plies=8))
+        assert sorted(r['seed'] for r in rs) == [0, 1, 2, 3, 4]
+
+    def test_game_matches_play_game(self):
+        r = selfplay.play_set(1, 'klash', base_seed=7, max_plies=20, workers=1)[0]
+        assert _moves(r) == _moves(selfplay.play_game('klash', seed=7, max_plies=20))
+
+
+class TestCLI:
+    def test_json_lines(self, capsys):
+        assert selfplay.main(['--games', '2', '--max-plies', '6',
+                              '--workers', '2']) == 0
+        lines = capsys.readouterr().out.splitlines()
+        rows = sorted((json.loads(l) for l in lines), key=lambda r: r['seed'])
+        assert [r['seed'] for r in rows] == [0, 1]
+        assert all(r['plies'] <= 6 for r in rows)
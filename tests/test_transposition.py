@@ -0,0 +1,188 @@
+"""Tests for TranspositionTable: packing round-trip, the two-slot
+replacement policy, counters and the memory budget."""
+
+import copy
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.CRITICAL)
+
+from thud import ai_engine, zobrist
+from thud.ai_engine import AIEngine
+from thud.gameboard import Gameboard
+from thud.ply import Ply
+from thud.transposition import (EXACT, LOWER, UPPER, ENTRY_BYTES,
+                                TranspositionTable, pack_move)
+
+
+def _tiny():
+    # 4 buckets: keys that agree in their low two bits share a bucket.
+    return TranspositionTable(mb=4 * 2 * ENTRY_BYTES / (1 << 20))
+
+
+class TestProbeStore:
+    def test_round_trip(self):
+        tt = _tiny()
+        move = pack_move(Ply('troll', 120, 121, [104]))
+        tt.store(0xdeadbeef, -37, 5, LOWER, move)
+        assert tt.probe(0xdeadbeef) == (-37, 5, LOWER, move)
+
+    def test_miss_on_unknown_key(self):
+        tt = _tiny()
+        tt.store(1, 10, 1)
+        assert tt.probe(5) is None
+        assert tt.stats()['misses'] == 1
+
+    def test_scores_are_clamped_to_the_field(self):
+        tt = _tiny()
+        tt.store(3, 10 ** 6, 1)
+        tt.store(4, -10 ** 6, 1)
+        assert tt.probe(3)[0] == (1 << 15) - 1
+        assert tt.probe(4)[0] == -(1 << 15)
+
+    def test_pack_move_ignores_captures_and_none(self):
+        assert pack_move(Ply('dwarf', 18, 35, [])) == pack_move(Ply('dwarf', 18, 35, [52]))
+        assert pack_move(Ply(None, None, None)) == 0
+
+
+class TestReplacement:
+    def test_shallow_result_does_not_evict_deep_one(self):
+        tt = _tiny()
+        tt.store(0x10, 1, 6, EXACT)
+        tt.store(0x20, 2, 1, UPPER)  # same bucket, shallower
+        assert tt.probe(0x10) == (1, 6, EXACT, 0)
+        assert tt.probe(0x20) == (2, 1, UPPER, 0)
+
+    def test_always_replace_slot_takes_the_newest(self):
+        tt = _tiny()
+        tt.store(0x10, 1, 6)
+        tt.store(0x20, 2, 1)
+        tt.store(0x30, 3, 1)
+        assert tt.probe(0x10) is not None
+        assert tt.probe(0x20) is None
+        assert tt.probe(0x30) == (3, 1, EXACT, 0)
+        assert tt.stats()['overwrites'] == 1
+
+    def test_deeper_result_takes_the_preferred_slot(self):
+        tt = _tiny()
+        tt.store(0x10, 1, 2)
+        tt.store(0x20, 2, 3)
+        assert tt.probe(0x20) == (2, 3, EXACT, 0)
+        assert tt.stats()['overwrites'] == 1
+
+    def test_same_key_updates_in_place(self):
+        tt = _tiny()
+        tt.store(0x10, 1, 2)
+        tt.store(0x10, 9, 4)
+        assert tt.probe(0x10) == (9, 4, EXACT, 0)
+        assert tt.stats()['overwrites'] == 0
+
+    def test_shallow_same_key_result_does_not_replace_deep_one(self):
+        tt = _tiny()
+        tt.store(7, 100, 6)
+        tt.store(7, 1, 1)
+        assert tt.probe(7) == (100, 6, EXACT, 0)
+
+    def test_deeper_store_clears_the_other_copy(self):
+        tt = _tiny()
+        tt.store(0x10, 1, 6)
+        tt.store(0x20, 2, 1)  # always-replace slot
+        tt.store(0x20, 3, 8)  # now deep enough for the preferred slot
+        assert tt.probe(0x20) == (3, 8, EXACT, 0)
+        assert tt.probe(0x20, 1) is None
+        assert tt.probe(0x10) is None
+
+
+class TestBudget:
+    def test_entry_count_follows_megabytes(self):
+        tt = TranspositionTable(mb=1)
+        assert tt.stats()['entries'] * ENTRY_BYTES == 1 << 20
+
+    def test_clear_keeps_size_and_resets_counters(self):
+        tt = TranspositionTable(mb=1)
+        tt.store(1, 1, 1)
+        tt.probe(1)
+        tt.clear()
+        assert tt.probe(1) is None
+        assert tt.stats()['hits'] == 0
+        assert tt.stats()['entries'] * ENTRY_BYTES == 1 << 20
+
+    def test_probe_at_another_depth_is_a_miss(self):
+        tt = TranspositionTable(mb=1)
+        tt.store(1, 5, 2)
+        assert tt.probe(1, 1) is None
+        assert tt.probe(1, 3) is None
+        assert tt.stats()['hits'] == 0
+        assert tt.stats()['misses'] == 2
+        assert tt.probe(1, 2)[0] == 5
+        assert tt.stats()['hits'] == 1
+
+    def test_clear_can_keep_the_counters(self):
+        tt = TranspositionTable(mb=1)
+        tt.store(1, 1, 1)
+        tt.probe(1)
+        tt.clear(stats=False)
+        assert tt.probe(1) is None
+        assert (tt.stats()['hits'], tt.stats()['misses']) == (1, 1)
+        tt.store(2, 1, 1)
+        tt.clear(stats=False)
+        assert tt.probe(2) is None
+        tt.reset_stats()
+        assert tt.stats()['hits'] == tt.stats()['stores'] == 0
+
+    def test_seed_keeps_the_counters(self):
+        AIEngine.tt.probe(12345)
+        misses = AIEngine.tt.stats()['misses']
+        ai_engine.seed(1)
+        assert AIEngine.tt.stats()['misses'] == misses
+
+    def test_clear_reuses_the_storage(self):
+        tt = TranspositionTable(mb=1)
+        data = tt._data
+        for key in range(1, 100):
+            tt.store(key, key, 1)
+        tt.clear()
+        assert tt._data is data
+        assert all(tt.probe(key) is None for key in range(1, 100))
+
+
+class TestPredictFutureCache:
+    def test_repeat_lookahead_is_served_from_the_table(self):
+        g = Gameboard('classic')
+        AIEngine.tt.clear()
+        first = next(g.find_moves('dwarf'))
+        a = AIEngine.predict_future(g, first, 1, 'dwarf')
+        hits = AIEngine.tt.stats()['hits']
+        b = AIEngine.predict_future(g, first, 1, 'dwarf')
+        assert a == b
+        assert AIEngine.tt.stats()['hits'] == hits + 1
+        # Stored from the troll's side; the dwarf's view is the negation.
+        assert AIEngine.predict_future(g, first, 1, 'troll') == -a
+
+    def test_another_game_starts_from_an_empty_table(self):
+        g = Gameboard('classic')
+        first = next(g.find_moves('dwarf'))
+        AIEngine.predict_future(g, first, 1, 'dwarf')
+        hits = AIEngine.tt.stats()['hits']
+        # A copy is the same game (the GUI searches on a deepcopy)...
+        AIEngine.predict_future(copy.deepcopy(g), first, 1, 'dwarf')
+        assert AIEngine.tt.stats()['hits'] == hits + 1
+        # ...a new board is not.
+        AIEngine.predict_future(Gameboard('classic'), first, 1, 'dwarf')
+        assert AIEngine.tt.stats()['hits'] == hits + 1
+
+    def test_key_tells_rulesets_and_kvt_jump_apart(self):
+        boards = [Gameboard(r) for r in ('classic', 'kvt', 'klash')]
+        for b in boards[1:]:
+            b.dwarfs, b.trolls, b.thudstone = (boards[0].dwarfs, boards[0].trolls,
+                                               boards[0].thudstone)
+            b.klash_trolls = boards[0].klash_trolls
+        assert len({b.zobrist for b in boards}) == 1
+        kvt = boards[1]
+        keys = {b.zobrist ^ zobrist.rules_key(b) for b in boards}
+        kvt.ply_list.append(Ply('troll', 120, 121, [104]))
+        keys.add(kvt.zobrist ^ zobrist.rules_key(kvt))
+        assert len(keys) == 4
@@ -3,10 +3,18 @@
 Submodules are organized by responsibility:
 
   * bitboard       — 289-bit board mask (Bitboard)
+  * rays           — precomputed per-square ray and neighbour tables
   * ply            — half-move + notation (Ply, NoMoveException)
   * influence_map  — heuristic influence grid (InfluenceMap)
   * gameboard      — rules + legal-move enumeration (Gameboard)
+  * zobrist        — 64-bit position keys maintained by Gameboard
+  * transposition  — bounded position cache (TranspositionTable)
   * ai_engine      — heuristic move chooser (AIEngine, ai_log)
+  * search         — alpha-beta negamax chooser (Searcher)
+  * mcts           — Monte Carlo Tree Search chooser (MCTS)
+  * parallel       — root-parallel scoring over a process pool
+  * shards         — rotating self-play output files (ShardWriter)
+  * perft          — move-generator node counts and throughput
 
 The top-level package re-exports the names that the GUI and CLI use so
 ``from thud import *`` still works for existing call sites.
@@ -1,10 +1,12 @@
 """AIEngine — heuristic move chooser for both sides.
 
 Per-call lifecycle: a fresh ``AIEngine`` is constructed around a board
-snapshot (deep-copied so simulation can mutate freely without touching
+(deep-copied by default so ``apply`` can mutate freely without touching
 the caller's state). The engine then either evaluates a specific ply
 (``apply`` / ``score`` / ``predict_future``) or asks
-``calculate_best_move`` to pick one.
+``calculate_best_move`` to pick one. The move chooser itself works on the
+caller's board in place via ``Gameboard.push`` / ``pop``, leaving it
+exactly as it found it.
 
 Logging goes through the module-level ``ai_log`` logger (level INFO).
 """
@@ -15,9 +17,12 @@ import logging
 import math
 import random
 
+from . import zobrist
 from .bitboard import Bitboard
 from .influence_map import InfluenceMap
 from .ply import NoMoveException, Ply
+from .search import Searcher
+from .transposition import EXACT, TranspositionTable, pack_move
 
 
 ai_log = logging.getLogger('ai_logger')
@@ -31,19 +36,41 @@ ai_log.addHandler(_handler)
 # first real candidate always wins. Matches the default Ply.score sentinel.
 WORST_SCORE = -100
 
+# Move choosers calculate_best_move can run.
+ENGINES = ('heuristic', 'search', 'mcts')
+
 # Engine RNG. Kept separate from the global ``random`` so ML self-play can
 # seed it for reproducible games without perturbing the rest of the process.
 _rng = random.Random()
 
 
 def seed(value):
-    """Seed the engine's move-selection RNG (for reproducible self-play)."""
+    """Seed the engine's move-selection RNG (for reproducible self-play).
+
+    Also empties the transposition table (its counters carry on): a cached
+    lookahead replaces the random choices that would have produced it, so a
+    seeded game is only reproducible from a cold table.
+    """
     _rng.seed(value)
+    AIEngine.tt.clear(stats=False)
 
 
 class AIEngine(object):
-    def __init__(self, board):
-        self.board = copy.deepcopy(board)
+    # Process-wide cache of predict_future results, keyed by the Zobrist key
+    # of the position after the first ply plus its rules word
+    # (zobrist.rules_key). It serves one game at a time: _table() empties it
+    # when a board from another game asks. Resize with
+    # AIEngine.tt.resize(mb); AIEngine.tt.stats() reports hit/miss/overwrite
+    # counts.
+    tt = TranspositionTable()
+    _tt_game = None
+    # Candidates select_best_future proved dominated and never played out.
+    skipped = 0
+
+    def __init__(self, board, isolate=True):
+        # isolate=False shares the caller's board: only safe when every
+        # mutation is a balanced push()/pop(), as in calculate_best_move.
+        self.board = copy.deepcopy(board) if isolate else board
         self.moves = []
         self.threats = []
         self.setups = []
@@ -56,11 +83,8 @@ class AIEngine(object):
 
     def score(self, token):
         """Material-only score: trolls count quadruple, dwarfs count single."""
-        if token == 'troll':
-            score = len(self.board.trolls) * 4 - len(self.board.dwarfs)
-        else:
-            score = len(self.board.dwarfs) - len(self.board.trolls) * 4
-        return score
+        score = self.board.troll_material()
+        return score if token == 'troll' else -score
 
     def filter_adjacent_threats(self, token):
         """Return capture-plies that eliminate dwarfs adjacent to our trolls.
@@ -74,7 +98,7 @@ class AIEngine(object):
             return []
 
         adjacent_threats = set()
-        for t in self.board.trolls.get_bits():
+        for t in self.board.trolls.positions():
             adjacent_threats.update(self.board.tokens_adjacent(t, 'dwarf'))
 
         solutions = []
@@ -116,11 +140,11 @@ class AIEngine(object):
         """Count friendly pieces the opponent could capture next turn."""
         def is_threatened(pos):
             if self.board.trolls[pos]:
-                for i in self.board.dwarfs.get_bits():
+                for i in self.board.dwarfs.positions():
                     if self.board.validate_move(i, pos, False, True)[1]:
                         return True
             elif self.board.dwarfs[pos]:
-                for i in self.board.trolls.get_bits():
+                for i in self.board.trolls.positions():
                     direction = self.board.get_direction(i, pos)
                     if self.board.validate_move(i, i + direction, False, True)[1]:
                         return True
@@ -128,7 +152,7 @@ class AIEngine(object):
         pieces = {'troll': self.board.trolls,
                   'dwarf': self.board.dwarfs}[friendly_token]
         count = 0
-        for i in pieces.get_bits():
+        for i in pieces.positions():
             if is_threatened(i):
                 count += 1
         return count
@@ -177,8 +201,8 @@ class AIEngine(object):
         lowest = 100
         candidates = []
 
-        for t in self.board.trolls.get_bits():
-            for d in self.board.dwarfs.get_bits():
+        for t in self.board.trolls.positions():
+            for d in self.board.dwarfs.positions():
                 hypotenuse = Ply.calc_pythagoras(t, d)
                 if hypotenuse < lowest:
                     lowest = hypotenuse
@@ -231,35 +255,113 @@ class AIEngine(object):
         if not candidates:
             return Ply(None, None, None, None)
         for p in candidates:
-            scratch = AIEngine(self.board)
-            scratch.apply((p,))
-            p.score = scratch.score(token)
+            self.board.push(p)
+            p.score = self.score(token)
+            self.board.pop()
         candidates.sort(key=lambda v: v.score, reverse=True)
         best = candidates[0].score
         threshold = best - abs(best) * variance_pct
         top = [p for p in candidates if p.score >= threshold]
         return _rng.choice(top)
 
+    @staticmethod
+    def _table(board):
+        """``AIEngine.tt``, emptied first if it last served another game."""
+        if AIEngine._tt_game != board.game_id:
+            AIEngine.tt.clear(stats=False)
+            AIEngine._tt_game = board.game_id
+        return AIEngine.tt
+
     @staticmethod
     def predict_future(board, firstply, lookahead, token):
-        """Apply ``firstply``, then auto-play ``lookahead`` moves; return ``token``'s score."""
-        b = AIEngine(board)
-        b.apply((firstply,))
-        for i in range(1, lookahead + 1):
-            try:
-                result = AIEngine.calculate_best_move(b.board, b.board.turn_to_act(), 0)
-                assert result
-                b.apply((result,))
-            except NoMoveException:
-                break
-        return b.score(token)
+        """Apply ``firstply``, then auto-play ``lookahead`` moves; return ``token``'s score.
+
+        Plays forward on ``board`` itself with push/pop and unwinds every
+        ply before returning, so the caller's board is left unchanged.
+        Results for ``lookahead > 0`` are cached in ``AIEngine.tt`` (stored
+        from the troll's side, as material is zero-sum). The playout picks
+        moves at random among near-equals, so a cached result is one sample:
+        later calls in the same game get that sample back instead of
+        drawing another.
+        """
+        b = AIEngine(board, isolate=False)
+        sign = 1 if token == 'troll' else -1
+        board.push(firstply)
+        pushed = 1
+        try:
+            if lookahead:
+                tt = AIEngine._table(board)
+                key = board.zobrist ^ zobrist.rules_key(board)
+                hit = tt.probe(key, lookahead)
+                if hit is not None:
+                    return sign * hit[0]
+            reply = None
+            for i in range(1, lookahead + 1):
+                try:
+                    result = AIEngine.calculate_best_move(board, board.turn_to_act(), 0)
+                    assert result
+                    board.push(result)
+                    pushed += 1
+                    reply = reply or result
+                except NoMoveException:
+                    break
+            score = b.score(token)
+            if lookahead:
+                for _ in range(pushed - 1):
+                    board.pop()
+                pushed = 1
+                tt.store(key, sign * score, lookahead, EXACT, pack_move(reply))
+            return score
+        finally:
+            for _ in range(pushed):
+                board.pop()
 
     @staticmethod
-    def select_best_future(board, plies, lookahead, token):
-        """Of all candidate plies, return the one with the best predicted future."""
+    def max_gain(board, token):
+        """Most material ``token`` can win in one ply on ``board``'s ruleset.
+
+        A troll shove takes at most the 8 dwarfs around its landing square
+        (a klash materialization is worth 4); a dwarf takes one troll, or in
+        KVT every troll it flanks.
+        """
+        if token == 'troll':
+            return 8
+        return 4 * (8 if board.ruleset == 'kvt' else 1)
+
+    @staticmethod
+    def select_best_future(board, plies, lookahead, token, hints=None,
+                           workers=None, chunksize=None):
+        """Of all candidate plies, return the one with the best predicted future.
+
+        Candidates are taken in ``Gameboard.ordered_plies`` order (captures
+        first, then ``hints``' killers and history), so the best score is
+        usually found early. A candidate whose score can't beat it even if
+        ``token`` captured the maximum on every one of its turns in the
+        lookahead is skipped without playing it out; ties go to the earlier
+        candidate either way, so skipping never changes the answer for a
+        given order. ``AIEngine.skipped`` counts the skips.
+
+        With ``workers``, candidates are instead played out ``chunksize`` at
+        a time across a process pool (:mod:`thud.parallel`); nothing is
+        skipped, and ties still go to the earlier candidate.
+        """
+        if workers:
+            from . import parallel
+            return parallel.select_best_future(board, plies, lookahead, token,
+                                               workers, chunksize, hints)
         best_score = WORST_SCORE - 1
         best_ply = None
-        for ply in plies:
+        base = AIEngine(board, isolate=False).score(token)
+        # Plies after the candidate alternate opponent, us, opponent, ...
+        future_gain = (lookahead // 2) * AIEngine.max_gain(board, token)
+        for ply in board.ordered_plies(token, hints, plies=plies):
+            if ply.origin == ply.dest:
+                gain = 4  # klash materialization
+            else:
+                gain = len(ply.captured) * (1 if token == 'troll' else 4)
+            if base + gain + future_gain <= best_score:
+                AIEngine.skipped += 1
+                continue
             score = AIEngine.predict_future(board, ply, lookahead, token)
             if score > best_score:
                 best_score = score
@@ -267,24 +369,93 @@ class AIEngine(object):
         return best_ply
 
     @staticmethod
-    def calculate_best_move(board, token, lookahead=0):
+    def calculate_best_move(board, token, lookahead=0, engine='heuristic',
+                            time_budget_ms=None, workers=None, chunksize=None,
+                            rollout=None, **mcts_options):
         """Return ``token``'s best move on ``board``, optionally with a lookahead.
 
-        Raises ``NoMoveException`` if the side has been wiped or no move
-        can be chosen.
+        ``engine`` picks the chooser: ``'heuristic'`` (the default),
+        ``'search'``, an alpha-beta search (:mod:`thud.search`) to depth
+        ``lookahead + 1`` sharing ``AIEngine.tt``, or ``'mcts'``, UCT
+        (:mod:`thud.mcts`; ``lookahead`` is ignored). MCTS rolls out with
+        the ``rollout`` policy (``'random'`` unless given, or
+        ``'heuristic'``); ``mcts_options`` (``playouts``, ``rollout_depth``,
+        ``exploration``, ``rng``) go to :class:`~thud.mcts.MCTS` as well.
+        Other engines reject both.
+
+        ``time_budget_ms`` bounds the latency instead, for ``'search'`` and
+        ``'mcts'``. MCTS stops playing out when it runs out; the search
+        deepens iteratively and answers from the last depth it completed
+        within the budget (``lookahead`` is then ignored). The heuristic has
+        no depth to cut short and rejects a budget.
+
+        ``workers`` splits the root candidates of the heuristic's lookahead
+        playouts, or of the fixed-depth search, across that many processes
+        (:mod:`thud.parallel`; the pool is kept for later moves), ``chunksize``
+        candidates per task. MCTS and the timed search run in-process and
+        reject ``workers``.
+
+        Raises ``ValueError`` for an unknown ``engine`` or an unsupported
+        combination of options, and ``NoMoveException`` if the side has been
+        wiped or no move can be chosen.
         """
+        if engine not in ENGINES:
+            raise ValueError("unknown engine: {!r}".format(engine))
+        if time_budget_ms is not None and engine == 'heuristic':
+            raise ValueError("time_budget_ms needs engine='search' or 'mcts'")
+        if workers and (engine == 'mcts' or time_budget_ms is not None):
+            raise ValueError('workers is not supported with engine={!r} and '
+                             'time_budget_ms={!r}'.format(engine, time_budget_ms))
+        if engine != 'mcts' and (rollout is not None or mcts_options):
+            raise ValueError("rollout and MCTS options need engine='mcts'")
         decision = None
         best_move = None
 
-        b = AIEngine(board)
+        # No copy: everything below only reads the board or push/pops on it.
+        b = AIEngine(board, isolate=False)
 
-        if not len(b.board.dwarfs):
+        if not b.board.dwarf_count:
             raise NoMoveException('dwarf')
         # Klash starts with zero trolls on the board (they materialize during
         # play), so an empty troll bitboard is only "routed" outside klash.
-        if not len(b.board.trolls) and b.board.ruleset != 'klash':
+        if not b.board.troll_count and b.board.ruleset != 'klash':
             raise NoMoveException('troll')
 
+        if engine == 'mcts':
+            # Imported here: thud.mcts builds on AIEngine (heuristic rollouts).
+            from .mcts import DEFAULT_PLAYOUTS, MCTS
+            if rollout is not None:
+                mcts_options['rollout'] = rollout
+            mcts_options.setdefault(
+                'playouts', DEFAULT_PLAYOUTS if time_budget_ms is None else None)
+            tree = MCTS(time_budget_ms=time_budget_ms, **mcts_options)
+            decision = tree.best_move(b.board, token)
+            ai_log.info('MCTS %s: %s (%d playouts)', token, decision, tree.completed)
+            return decision
+        elif engine == 'search' and time_budget_ms is not None:
+            searcher = Searcher(tt=AIEngine._table(b.board))
+            decision, score = searcher.iterative_deepening(b.board, token,
+                                                           time_budget_ms)
+            ai_log.info('SEARCH %s %d ms, depth %d: %s (%s, %d nodes)', token,
+                        time_budget_ms, searcher.completed_depth, decision,
+                        score, searcher.nodes)
+            return decision
+        elif engine == 'search' and workers:
+            from . import parallel
+            decision, score = parallel.search_best_move(
+                b.board, token, lookahead + 1, workers, chunksize)
+            if decision is None:
+                raise NoMoveException(token)
+            ai_log.info('SEARCH %s depth %d, %d workers: %s (%d)', token,
+                        lookahead + 1, workers, decision, score)
+            return decision
+        elif engine == 'search':
+            searcher = Searcher(depth=lookahead + 1, tt=AIEngine._table(b.board))
+            decision, score = searcher.best_move(b.board, token)
+            ai_log.info('SEARCH %s depth %d: %s (%d, %d nodes)', token,
+                        searcher.depth, decision, score, searcher.nodes)
+            return decision
+
         if token == 'troll':
             ai_log.info('TROLL')
             ai_log.info('turn: %d', len(b.board.ply_list) / 2)
@@ -297,7 +468,8 @@ class AIEngine(object):
                 ai_log.info('save %i %s', decision.score, decision or 'x')
             else:
                 tsb = AIEngine.select_best_future(
-                    b.board, itertools.chain(b.threats, b.setups), 0, token)
+                    b.board, itertools.chain(b.threats, b.setups), 0, token,
+                    workers=workers, chunksize=chunksize)
                 if tsb:
                     decision = tsb
                 else:
@@ -312,7 +484,7 @@ class AIEngine(object):
             ai_log.debug('%s', ', '.join(str(s) for s in b.threats))
             ai_log.info('# setups: %i', len(b.setups))
             ai_log.debug('%s', ', '.join(str(s) for s in b.setups))
-            ai_log.info('  T: %i d: %i\n', len(b.board.trolls) * 4, len(b.board.dwarfs))
+            ai_log.info('  T: %i d: %i\n', b.board.troll_count * 4, b.board.dwarf_count)
         elif token == 'dwarf':
             ai_log.info('DWARF')
             ai_log.info('turn: %d', len(b.board.ply_list) / 2)
@@ -331,7 +503,7 @@ class AIEngine(object):
                 tsb = AIEngine.select_best_future(
                     b.board,
                     itertools.chain(b.threats, b.setups, b.blocks),
-                    lookahead, token)
+                    lookahead, token, workers=workers, chunksize=chunksize)
 
                 imap = InfluenceMap(b.board.dwarfs, b.board.trolls)
                 empties_adjacent = []
@@ -364,7 +536,7 @@ class AIEngine(object):
             ai_log.info('# setups: %i', len(b.setups))
             ai_log.debug('%s', ', '.join(str(s) for s in b.setups))
             ai_log.info('# moves: %i', len(b.moves))
-            ai_log.info('  T: %i d: %i\n', len(b.board.trolls) * 4, len(b.board.dwarfs))
+            ai_log.info('  T: %i d: %i\n', b.board.troll_count * 4, b.board.dwarf_count)
 
         if not decision:
             raise NoMoveException(token)
@@ -4,9 +4,99 @@ This is the core spatial primitive the engine builds on. Every kind of
 piece-set (dwarfs, trolls, the thudstone, the playable area) is stored as
 a Bitboard, so move/capture enumeration becomes bit-shift + mask, with no
 per-square Python loops in the hot path.
+
+The module-level functions below are the same operations on raw ints.
+``Gameboard`` keeps its own state as raw ints and works on them directly
+in the move generators and ``validate_move``, where wrapping every
+intermediate mask in a new Bitboard object is the dominant cost.
 """
 
 
+BOARD_WIDTH = 17
+N = BOARD_WIDTH * BOARD_WIDTH
+MASK = (1 << N) - 1
+
+
+def _file_mask(file):
+    m = 0
+    for rank in range(BOARD_WIDTH):
+        m |= 1 << (N - 1 - (rank * BOARD_WIDTH + file))
+    return m
+
+
+NOT_FIRST_FILE = MASK & ~_file_mask(0)
+NOT_LAST_FILE = MASK & ~_file_mask(BOARD_WIDTH - 1)
+
+# What a one-step shift must keep, per direction: a step that moves one
+# file right can't legitimately land on the first file (that's a wrap from
+# the previous rank's last file), and vice versa.
+SHIFT_MASKS = {
+    -BOARD_WIDTH - 1: NOT_LAST_FILE, -BOARD_WIDTH: MASK, -BOARD_WIDTH + 1: NOT_FIRST_FILE,
+    BOARD_WIDTH - 1: NOT_LAST_FILE, BOARD_WIDTH: MASK, BOARD_WIDTH + 1: NOT_FIRST_FILE,
+    -1: NOT_LAST_FILE, 1: NOT_FIRST_FILE,
+}
+
+
+def shift(value, direction):
+    """Raw-int form of :meth:`Bitboard.shift`."""
+    if direction > 0:
+        return (value >> direction) & SHIFT_MASKS[direction]
+    return (value << -direction) & SHIFT_MASKS[direction]
+
+
+def dilate(value):
+    """Every square one king step from a set square in ``value`` (the
+    eight shifts ORed; ``value``'s own squares only where they neighbour
+    each other)."""
+    out = 0
+    for direction, keep in SHIFT_MASKS.items():
+        if direction > 0:
+            out |= (value >> direction) & keep
+        else:
+            out |= (value << -direction) & keep
+    return out
+
+
+def bit(position):
+    """Raw int with only ``position`` set. Raises ValueError off the board."""
+    if not 0 <= position < N:
+        raise ValueError("position out of range: {!r}".format(position))
+    return 1 << (N - 1 - position)
+
+
+def mask_of(positions):
+    """Raw int with every one of ``positions`` set (validated as in
+    ``Bitboard(positions)``)."""
+    value = 0
+    for p in positions:
+        # Reject anything that isn't a real board square. Without this
+        # a large negative position makes ``1 << (N-1-p)`` allocate a
+        # multi-gigabyte integer (a one-message DoS via the server),
+        # and a non-int blows up with a confusing TypeError deep in the
+        # shift. Callers that pass untrusted input (Gameboard.is_dumb)
+        # already catch ValueError/TypeError and treat it as illegal.
+        if not isinstance(p, int) or not (0 <= p < N):
+            raise ValueError("position out of range: {!r}".format(p))
+        value |= 1 << (N - 1 - p)
+    return value
+
+
+def is_set(value, position):
+    """Raw-int form of ``Bitboard.__getitem__``: 0 or 1, and 0 off the board."""
+    if 0 <= position < N:
+        return (value >> (N - 1 - position)) & 1
+    return 0
+
+
+def iter_bits(value):
+    """Raw-int form of :meth:`Bitboard.get_bits`."""
+    value &= MASK
+    while value:
+        top = value.bit_length()
+        yield N - top
+        value ^= 1 << (top - 1)
+
+
 class Bitboard:
     """Fixed-width 289-bit mask over a 17x17 board.
 
@@ -20,25 +110,16 @@ class Bitboard:
     field so values never go negative or grow beyond the board.
     """
 
-    BOARD_WIDTH = 17
-    N = BOARD_WIDTH * BOARD_WIDTH
-    MASK = (1 << N) - 1
+    BOARD_WIDTH = BOARD_WIDTH
+    N = N
+    MASK = MASK
 
-    __slots__ = ('value',)
+    # _positions caches positions() as (value it was computed for, tuple).
+    __slots__ = ('value', '_positions')
 
     def __init__(self, positions=None):
-        self.value = 0
-        if positions:
-            for p in positions:
-                # Reject anything that isn't a real board square. Without this
-                # a large negative position makes ``1 << (N-1-p)`` allocate a
-                # multi-gigabyte integer (a one-message DoS via the server),
-                # and a non-int blows up with a confusing TypeError deep in the
-                # shift. Callers that pass untrusted input (Gameboard.is_dumb)
-                # already catch ValueError/TypeError and treat it as illegal.
-                if not isinstance(p, int) or not (0 <= p < Bitboard.N):
-                    raise ValueError("position out of range: {!r}".format(p))
-                self.value |= 1 << (Bitboard.N - 1 - p)
+        self.value = mask_of(positions) if positions else 0
+        self._positions = None
 
     def __str__(self):
         return format(self.value & Bitboard.MASK, '0{}b'.format(Bitboard.N))
@@ -55,14 +136,11 @@ class Bitboard:
         # Off-board indices read as unset rather than raising. token_at and
         # neighbour walks probe positions just past the edge (p < 0 or
         # p >= N); a key >= N would otherwise be a negative shift -> ValueError.
-        if not (0 <= key < Bitboard.N):
-            return 0
-        return (self.value >> (Bitboard.N - 1 - key)) & 1
+        return is_set(self.value, key)
 
     def __iter__(self):
-        v = self.value & Bitboard.MASK
-        for i in range(Bitboard.N):
-            yield (v >> (Bitboard.N - 1 - i)) & 1
+        # str() is already in position order; one int per character.
+        return map(int, str(self))
 
     def __lshift__(self, other):
         return Bitboard.create((self.value << other) & Bitboard.MASK)
@@ -90,12 +168,30 @@ class Bitboard:
     def __hash__(self):
         return hash(self.value & Bitboard.MASK)
 
+    def shift(self, direction):
+        """Move every set position ``p`` one step to ``p + direction``.
+
+        ``direction`` is one of the eight king-step offsets (see
+        ``Gameboard.cycle_direction``). Bits that would step off the board,
+        or wrap from one edge file round to the other, are dropped, so
+        steps chain safely without masking in between.
+        """
+        return Bitboard.create(shift(self.value, direction))
+
     def get_bits(self):
-        """Yield positions (0..N-1) of set bits, in ascending order."""
-        v = self.value & Bitboard.MASK
-        for i in range(Bitboard.N):
-            if v & (1 << (Bitboard.N - 1 - i)):
-                yield i
+        """Yield positions (0..N-1) of set bits, in ascending order.
+
+        Jumps from set bit to set bit (highest first, which is lowest
+        position first) rather than testing all N squares.
+        """
+        return iter_bits(self.value)
+
+    def positions(self):
+        """Tuple of set positions, ascending; computed once per value."""
+        cached = self._positions
+        if cached is None or cached[0] != self.value:
+            cached = self._positions = (self.value, tuple(self.get_bits()))
+        return cached[1]
 
     @staticmethod
     def create(integer):
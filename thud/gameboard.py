@@ -5,14 +5,32 @@ Owns the four Bitboards that constitute a position (``trolls``, ``dwarfs``,
 sticky ``game_winner`` once an outcome is reached. Pure rules layer: no
 AI, no I/O.
 
+Internally the boards are raw ints (``_dwarfs`` etc., in
+:class:`~thud.bitboard.Bitboard`'s bit order), operated on with the raw
+helpers in :mod:`thud.bitboard`; the public attributes wrap them in
+Bitboards on access. A 289-byte mailbox (``_mailbox``, one square code
+per position) mirrors them so ``token_at`` is a single index; everything
+that changes the boards keeps it in step.
+
+``zobrist`` is a 64-bit key of the position (pieces, side to move, klash
+troll count), kept current incrementally by ``apply_ply``. Assigning one
+of the piece bitboards directly re-derives it from scratch.
+
+The keys of the positions reached this game are counted as plies are made
+and unmade (``repetitions``), along with the plies since the last capture
+(``quiet_plies``), so ``result`` can end a shuffling game without
+rescanning the history.
+
 Three rulesets are supported: ``classic`` (the canonical game),
 ``kvt`` (Koom Valley Thud — moveable thudstone, troll multi-captures),
 and ``klash``.
 """
 
-import copy
 
-from .bitboard import Bitboard
+import itertools
+
+from . import rays, zobrist
+from .bitboard import N, Bitboard, bit, dilate, is_set, iter_bits, mask_of, shift
 from .ply import Ply
 
 
@@ -22,20 +40,97 @@ KLASH_TROLL_LIMIT = 6
 # agreement/score); this is the mechanical stand-in so AI-vs-AI / ML
 # self-play always terminates. See Gameboard.result().
 DEFAULT_MAX_PLIES = 400
+# Earlier no-progress cutoffs for the same purpose: a position reached this
+# many times, or this many plies in a row without a capture.
+DEFAULT_MAX_REPETITIONS = 3
+DEFAULT_MAX_QUIET_PLIES = 100
+
+# Mailbox square codes, indexing the names token_at returns.
+_OFF, _EMPTY, _DWARF, _TROLL, _THUDSTONE = range(5)
+_TOKEN_NAMES = (None, 'empty', 'dwarf', 'troll', 'thudstone')
+
+# Source of Gameboard.game_id.
+_game_ids = itertools.count()
 
 
 class Gameboard:
     def __init__(self, ruleset='classic'):
         self.BOARD_WIDTH = Bitboard.BOARD_WIDTH
         self.ruleset = ruleset
+        # Names this game for process-wide caches; copies of the board
+        # (copy.deepcopy) keep it.
+        self.game_id = next(_game_ids)
         self.ply_list = []
         self.game_winner = None
         self.klash_trolls = 0
-
-        self.playable = self.get_default_board('playable', ruleset)
-        self.trolls = self.get_default_board('troll', ruleset)
-        self.dwarfs = self.get_default_board('dwarf', ruleset)
-        self.thudstone = self.get_default_board('thudstone', ruleset)
+        self._undo = []
+        self._wrappers = {}
+
+        self._playable = self.get_default_board('playable', ruleset).value
+        self._trolls = self.get_default_board('troll', ruleset).value
+        self._dwarfs = self.get_default_board('dwarf', ruleset).value
+        self._thudstone = self.get_default_board('thudstone', ruleset).value
+        self._rebuild_mailbox()
+        self._recount()
+        self.zobrist = zobrist.board_key(self)
+        self.quiet_plies = 0
+        self._restart_history()
+
+    def _wrap(self, name, value):
+        # One Bitboard per board, rebuilt only when the raw value changed,
+        # so repeated reads share it (and its cached positions()).
+        bb = self._wrappers.get(name)
+        if bb is None or bb.value != value:
+            bb = self._wrappers[name] = Bitboard.create(value)
+        return bb
+
+    # The piece bitboards are properties so that a direct assignment (board
+    # editors, tests, the GUI's setup code) keeps the Zobrist key in step;
+    # the move paths below write the private raw ints and update the key
+    # incrementally instead.
+    @property
+    def dwarfs(self):
+        return self._wrap('dwarfs', self._dwarfs)
+
+    @dwarfs.setter
+    def dwarfs(self, bb):
+        self._dwarfs = bb.value & Bitboard.MASK
+        self._rebuild_mailbox()
+        self._recount()
+        self.zobrist = zobrist.board_key(self)
+        self._restart_history()
+
+    @property
+    def trolls(self):
+        return self._wrap('trolls', self._trolls)
+
+    @trolls.setter
+    def trolls(self, bb):
+        self._trolls = bb.value & Bitboard.MASK
+        self._rebuild_mailbox()
+        self._recount()
+        self.zobrist = zobrist.board_key(self)
+        self._restart_history()
+
+    @property
+    def thudstone(self):
+        return self._wrap('thudstone', self._thudstone)
+
+    @thudstone.setter
+    def thudstone(self, bb):
+        self._thudstone = bb.value & Bitboard.MASK
+        self._rebuild_mailbox()
+        self.zobrist = zobrist.board_key(self)
+        self._restart_history()
+
+    @property
+    def playable(self):
+        return self._wrap('playable', self._playable)
+
+    @playable.setter
+    def playable(self, bb):
+        self._playable = bb.value & Bitboard.MASK
+        self._rebuild_mailbox()
 
     def turn_to_act(self):
         """Return the token of the side allowed to move now.
@@ -124,7 +219,40 @@ class Gameboard:
 
     def occupied_squares(self):
         """Union Bitboard of all squares currently occupied by any piece."""
-        return self.dwarfs | self.trolls | self.thudstone
+        return Bitboard.create(self._occupied())
+
+    def _recount(self):
+        # dwarf_count / troll_count mirror the boards' populations; the
+        # move paths adjust them rather than recounting.
+        self.dwarf_count = self._dwarfs.bit_count()
+        self.troll_count = self._trolls.bit_count()
+
+    def _restart_history(self):
+        # The position keys reached this game, oldest first, and how often
+        # each occurs; apply_ply/pop/restore keep both in step.
+        self._history = [self.zobrist]
+        self._seen = {self.zobrist: 1}
+
+    def _forget(self, count):
+        """Drop the last ``count`` positions from the history."""
+        history, seen = self._history, self._seen
+        for _ in range(count):
+            key = history.pop()
+            left = seen[key] - 1
+            if left:
+                seen[key] = left
+            else:
+                del seen[key]
+
+    def repetitions(self):
+        """How many times the current position has occurred this game."""
+        return self._seen.get(self.zobrist, 0)
+
+    def _occupied(self):
+        return self._dwarfs | self._trolls | self._thudstone
+
+    def _empty(self):
+        return self._playable & ~self._occupied()
 
     def snapshot(self):
         """Return a cheap, opaque snapshot of the mutable game state.
@@ -132,60 +260,173 @@ class Gameboard:
         For search / self-play this is dramatically cheaper than
         ``copy.deepcopy`` — it captures four ints plus a couple of scalars
         rather than walking the whole object graph. Pair with restore():
-        snapshot, apply plies, evaluate, restore. (The bundled heuristic AI
-        still deep-copies for isolation; wiring it onto snapshot/restore is
-        a future throughput win — see FIXUP.MD ML-readiness.)
+        snapshot, apply plies, evaluate, restore. For strictly nested
+        make/unmake (the AI's case) prefer push()/pop(), which allocate
+        nothing on undo.
         """
-        return (self.dwarfs.value, self.trolls.value, self.thudstone.value,
-                self.klash_trolls, len(self.ply_list), self.game_winner)
+        return (self._dwarfs, self._trolls, self._thudstone,
+                self.klash_trolls, len(self.ply_list), self.game_winner,
+                self.zobrist, self.dwarf_count, self.troll_count,
+                self.quiet_plies)
 
     def restore(self, snap):
         """Restore state captured by :meth:`snapshot`.
 
         ``ply_list`` is truncated back to its snapshot length (entries
         appended since the snapshot are dropped); earlier entries are left
-        untouched.
+        untouched. The repetition history is cut back the same way; when
+        it can't be (restoring forward, or a snapshot from another board)
+        it restarts at the restored position.
         """
-        dwarfs, trolls, thudstone, klash_trolls, ply_len, winner = snap
-        self.dwarfs = Bitboard.create(dwarfs)
-        self.trolls = Bitboard.create(trolls)
-        self.thudstone = Bitboard.create(thudstone)
+        (self._dwarfs, self._trolls, self._thudstone,
+         klash_trolls, ply_len, winner, key,
+         self.dwarf_count, self.troll_count, self.quiet_plies) = snap
         self.klash_trolls = klash_trolls
+        undone = len(self.ply_list) - ply_len
         del self.ply_list[ply_len:]
         self.game_winner = winner
+        self.zobrist = key
+        self._rebuild_mailbox()
+        if 0 <= undone < len(self._history):
+            self._forget(undone)
+        if self._history[-1] != key:
+            self._restart_history()
+
+    @classmethod
+    def from_snapshot(cls, ruleset, snap, last_ply=None):
+        """Build a board in the state :meth:`snapshot` captured, without
+        its move history (e.g. in a worker process that was only sent the
+        snapshot tuple).
+
+        ``ply_list`` is padded to the snapshot's length with ``last_ply``,
+        which is all the rules read from history: its length for the side
+        to move, and its last entry for KVT's capture-again rule.
+        """
+        board = cls(ruleset)
+        ply_len = snap[4]
+        board.ply_list = [last_ply] * ply_len
+        board.restore(snap)
+        return board
+
+    def push(self, ply):
+        """Make ``ply``: apply it, append it to ``ply_list`` and record an
+        undo entry so :meth:`pop` can take it back.
+
+        The boards are immutable ints, so the undo entry just keeps
+        references to the current ones — no copying on the way in, no
+        allocation on the way out. Pushes and pops must nest; don't
+        interleave them with restore().
+        """
+        self._undo.append((self._dwarfs, self._trolls, self._thudstone,
+                           self.klash_trolls, self.game_winner, self.zobrist,
+                           self.dwarf_count, self.troll_count,
+                           self.quiet_plies))
+        self.apply_ply(ply)
+        self.ply_list.append(ply)
+
+    def pop(self):
+        """Unmake the most recent :meth:`push`; return the ply taken back."""
+        (self._dwarfs, self._trolls, self._thudstone,
+         self.klash_trolls, self.game_winner, self.zobrist,
+         self.dwarf_count, self.troll_count,
+         self.quiet_plies) = self._undo.pop()
+        ply = self.ply_list.pop()
+        self._sync_mailbox(ply)
+        self._forget(1)
+        return ply
 
     def token_at(self, position):
         """Return 'troll' / 'dwarf' / 'thudstone' / 'empty' / None at position."""
-        if self.trolls[position]:
-            return 'troll'
-        elif self.dwarfs[position]:
-            return 'dwarf'
-        elif self.thudstone[position]:
-            return 'thudstone'
-        elif self.playable[position]:
-            return 'empty'
+        # Guard first: a negative index would silently read from the end.
+        if 0 <= position < N:
+            return _TOKEN_NAMES[self._mailbox[position]]
+        return None
+
+    def _square_code(self, position):
+        b = bit(position)
+        if self._trolls & b:
+            return _TROLL
+        elif self._dwarfs & b:
+            return _DWARF
+        elif self._thudstone & b:
+            return _THUDSTONE
+        elif self._playable & b:
+            return _EMPTY
+        return _OFF
+
+    def _rebuild_mailbox(self):
+        mailbox = bytearray(N)
+        # Later boards overwrite earlier ones: token_at's precedence.
+        for code, board in ((_EMPTY, self._playable), (_THUDSTONE, self._thudstone),
+                            (_DWARF, self._dwarfs), (_TROLL, self._trolls)):
+            for p in iter_bits(board):
+                mailbox[p] = code
+        self._mailbox = mailbox
+
+    def _sync_mailbox(self, ply):
+        """Re-read the squares ``ply`` touches from the bitboards."""
+        mailbox = self._mailbox
+        for p in (ply.origin, ply.dest, *ply.captured):
+            mailbox[p] = self._square_code(p)
 
     def add_troll(self, pos):
-        """Klash-only: add a troll at ``pos`` and bump the materialized count."""
-        self.trolls |= Bitboard([pos])
+        """Klash-only: add a troll at ``pos`` and bump the materialized count.
+
+        A board edit, not a ply: the side to move, the repetition history
+        and ``quiet_plies`` are left alone. Play a materialization with
+        ``apply_ply(Ply('troll', pos, pos, []))`` instead.
+        """
+        trolls = self._trolls | bit(pos)
+        self.zobrist ^= (zobrist.toggle(zobrist.PIECES['troll'],
+                                        trolls ^ self._trolls)
+                         ^ zobrist.KLASH[self.klash_trolls % len(zobrist.KLASH)]
+                         ^ zobrist.KLASH[(self.klash_trolls + 1) % len(zobrist.KLASH)])
+        self.troll_count += trolls != self._trolls
+        self._trolls = trolls
+        self._mailbox[pos] = _TROLL
         self.klash_trolls += 1
 
     def apply_ply(self, ply):
-        """Apply ``ply`` to the underlying bitboards (no validation)."""
+        """Apply ``ply`` to the underlying bitboards (no validation).
+
+        Also flips the side to move in ``zobrist``, keeps the piece counts
+        and ``quiet_plies``, and counts the new position towards
+        :meth:`repetitions`; callers append the ply to ``ply_list``
+        alongside (push() does both).
+        """
+        dwarfs, trolls, thudstone = self._dwarfs, self._trolls, self._thudstone
         if ply.token == 'troll':
             if ply.origin == ply.dest:
                 # Klash materialization: a troll appears on an empty central
                 # square (origin == dest). Route through add_troll so the
                 # materialized-troll count stays in sync with the win check.
                 self.add_troll(ply.dest)
+                trolls = self._trolls
             else:
-                self.trolls = self.trolls & ~Bitboard([ply.origin]) | Bitboard([ply.dest])
-            self.dwarfs = self.dwarfs & ~Bitboard(ply.captured)
+                self._trolls = self._trolls & ~bit(ply.origin) | bit(ply.dest)
+            if ply.captured:
+                self._dwarfs = self._dwarfs & ~mask_of(ply.captured)
         elif ply.token == 'dwarf':
-            self.dwarfs = self.dwarfs & ~Bitboard([ply.origin]) | Bitboard([ply.dest])
-            self.trolls = self.trolls & ~Bitboard(ply.captured)
+            self._dwarfs = self._dwarfs & ~bit(ply.origin) | bit(ply.dest)
+            if ply.captured:
+                self._trolls = self._trolls & ~mask_of(ply.captured)
         elif ply.token == 'thudstone':
-            self.thudstone = self.thudstone & ~Bitboard([ply.origin]) | Bitboard([ply.dest])
+            self._thudstone = self._thudstone & ~bit(ply.origin) | bit(ply.dest)
+        # XOR out/in exactly the squares that changed on each board.
+        self.zobrist ^= (
+            zobrist.toggle(zobrist.PIECES['dwarf'], dwarfs ^ self._dwarfs)
+            ^ zobrist.toggle(zobrist.PIECES['troll'], trolls ^ self._trolls)
+            ^ zobrist.toggle(zobrist.PIECES['thudstone'], thudstone ^ self._thudstone)
+            ^ zobrist.SIDE)
+        # Recount rather than assume a ply only removes captured pieces: an
+        # unvalidated ply (a replay with illegal moves allowed) can move
+        # from an empty square or onto one of its own pieces.
+        self._recount()
+        self._sync_mailbox(ply)
+        self.quiet_plies = 0 if ply.captured else self.quiet_plies + 1
+        key = self.zobrist
+        self._history.append(key)
+        self._seen[key] = self._seen.get(key, 0) + 1
 
     def cycle_direction(self):
         """Yield all 8 king-move direction offsets (in integer-position units)."""
@@ -216,6 +457,8 @@ class Gameboard:
 
     def get_direction(self, origin, dest):
         """Discrete 1-step direction from ``origin`` toward ``dest``."""
+        if 0 <= origin < Bitboard.N and 0 <= dest < Bitboard.N:
+            return rays.direction(origin, dest)
         delta = self.get_delta(Ply.position_to_tuple(origin), Ply.position_to_tuple(dest))
         return self.delta_to_direction(delta)
 
@@ -225,11 +468,21 @@ class Gameboard:
 
     def get_range(self, origin, dest):
         """Return the list of tokens along the line from ``origin`` to ``dest`` (inclusive)."""
+        if 0 <= origin < Bitboard.N and 0 <= dest < Bitboard.N:
+            steps = rays.steps(origin, dest)
+            if steps is not None:
+                ray = rays.RAYS[rays.direction(origin, dest)][origin]
+                token_at = self.token_at
+                return [token_at(origin)] + [token_at(i) for i in ray[:steps]]
+        # Off the grid or not on a common line: walk it the long way.
         direction = self.get_direction(origin, dest)
         return [self.token_at(i) for i in range(origin, dest + direction, direction)]
 
     def tokens_adjacent(self, position, token):
         """Return positions of pieces of type ``token`` adjacent to ``position``."""
+        if 0 <= position < Bitboard.N:
+            token_at = self.token_at
+            return [p for p in rays.NEIGHBOURS[position] if token_at(p) == token]
         return [position + d for d in self.cycle_direction()
                 if self.token_at(position + d) == token]
 
@@ -249,75 +502,71 @@ class Gameboard:
 
         def is_dumb(origin, dest):
             try:
-                origin_bb = Bitboard([origin])
-                dest_bb = Bitboard([dest])
+                origin_bit = bit(origin)
+                dest_bit = bit(dest)
             except (TypeError, ValueError):
                 return True
-            if not (origin_bb & self.playable):
-                return True
-            if not (dest_bb & self.playable):
+            if not (origin_bit & self._playable):
                 return True
-            if origin == dest:
+            if not (dest_bit & self._playable):
                 return True
-            t_origin = Ply.position_to_tuple(origin)
-            t_dest = Ply.position_to_tuple(dest)
-            df = t_origin[0] - t_dest[0]
-            dr = t_origin[1] - t_dest[1]
-            if df and dr and abs(df) != abs(dr):
-                return True
-            return False
+            # Same square, or not on a common rank, file or diagonal.
+            return rays.steps(origin, dest) is None
 
         def must_be_jump(position):
             """KVT: after a troll capture, that troll may only jump again."""
             if (self.ply_list
                     and self.ply_list[-1].token == 'troll'
                     and self.ply_list[-1].captured
-                    and self.trolls[position]):
+                    and is_set(self._trolls, position)):
                 return True
 
         def is_valid_cap_kvt(origin, dest):
             capturable = []
-            if self.dwarfs[origin]:
+            if is_set(self._dwarfs, origin):
                 for i in self.tokens_adjacent(dest, 'troll'):
                     direction = self.get_direction(dest, i)
                     seq = self.get_range(dest, dest + direction + direction)
                     if seq == ['empty', 'troll', 'dwarf']:
                         capturable.append(dest + direction)
                 return capturable
-            elif self.trolls[origin]:
+            elif is_set(self._trolls, origin):
                 if self.get_range(origin, dest) == ['troll', 'dwarf', 'empty']:
                     return [origin + self.get_direction(origin, dest)]
             return []
 
         def is_valid_cap_normal(origin, dest):
-            if self.dwarfs[origin]:
-                seq = self.get_range(origin, dest)
-                if seq.pop(-1) == 'troll' and seq.pop(0) == 'dwarf':
-                    if not len(seq):
-                        return [dest]
-                    if self.check_if_all(seq, 'empty'):
-                        direction = self.get_direction(dest, origin)
-                        if is_dumb(origin, origin + direction * len(seq)):
-                            return []
-                        newseq = self.get_range(origin, origin + direction * len(seq))
-                        if self.check_if_all(newseq, 'dwarf'):
-                            return [dest]
-            elif self.trolls[origin]:
-                seq = self.get_range(origin, dest)
-                if seq.pop(-1) == 'empty' and seq.pop(0) == 'troll':
-                    capturable = self.tokens_adjacent(dest, 'dwarf')
-                    if not capturable:
-                        return []
-                    elif not seq:
-                        return capturable
-                    elif self.check_if_all(seq, 'empty'):
-                        direction = self.get_direction(dest, origin)
-                        if is_dumb(origin, origin + direction * len(seq)):
-                            return []
-                        newseq = self.get_range(origin, origin + direction * len(seq))
-                        if self.check_if_all(newseq, 'troll'):
-                            return capturable
-            return []
+            # is_dumb() has passed: origin and dest are distinct playable
+            # squares on a common line. A capture across a gap of n empty
+            # squares needs a line of n more of the mover's pieces behind
+            # the origin, on the board.
+            if is_set(self._dwarfs, origin):
+                if not is_set(self._trolls, dest):
+                    return []
+                own, captured = self._dwarfs, [dest]
+            elif is_set(self._trolls, origin):
+                if not is_set(self._empty(), dest):
+                    return []
+                captured = self.tokens_adjacent(dest, 'dwarf')
+                if not captured:
+                    return []
+                own = self._trolls
+            else:
+                return []
+            d = rays.direction(origin, dest)
+            gap = rays.steps(origin, dest) - 1
+            if not gap:
+                return captured
+            between = rays.RAY_MASKS[d][origin] & ~(rays.RAY_MASKS[d][dest] | bit(dest))
+            if between & ~self._empty():
+                return []
+            behind = rays.RAYS[-d][origin]
+            if gap > len(behind) or not is_set(self._playable, behind[gap - 1]):
+                return []
+            line = rays.RAY_MASKS[-d][origin] & ~rays.RAY_MASKS[-d][behind[gap - 1]]
+            if line & ~own:
+                return []
+            return captured
 
         def is_valid_move(origin, dest):
             def max_troll_move():
@@ -341,9 +590,9 @@ class Gameboard:
                     return False
                 count, count2 = 0, 0
                 for i in self.cycle_direction():
-                    if self.dwarfs[origin + i]:
+                    if is_set(self._dwarfs, origin + i):
                         count += 1
-                    if self.dwarfs[dest + i]:
+                    if is_set(self._dwarfs, dest + i):
                         count2 += 1
                 return count >= 2 and count2 >= 2
             # Origin square is empty (or off-board): not a legal move. Falling
@@ -373,31 +622,47 @@ class Gameboard:
 
         return (move, bool(cap), cap)
 
+    def _flood(self, seed, within):
+        """Raw-int flood fill: the squares of ``within`` king-connected to
+        ``seed``, growing the whole frontier by one step per pass."""
+        group = frontier = seed & within
+        while frontier:
+            frontier = dilate(frontier) & within & ~group
+            group |= frontier
+        return group
+
+    def connected_components(self, bb):
+        """Split Bitboard ``bb`` into its king-connected groups.
+
+        Returns a list of Bitboards, ordered by each group's lowest
+        position. Each group is a bit-parallel flood fill, so the cost is
+        one dilation per step across the group rather than a visit per
+        square.
+        """
+        rest = bb.value & Bitboard.MASK
+        groups = []
+        while rest:
+            group = self._flood(1 << (rest.bit_length() - 1), rest)
+            groups.append(Bitboard.create(group))
+            rest &= ~group
+        return groups
+
     def get_game_outcome(self):
         """Return the winning side ('dwarf'/'troll'), or None if still playing."""
         def check_rout(token):
-            board = {'dwarf': self.dwarfs, 'troll': self.trolls}[token]
+            board = {'dwarf': self._dwarfs, 'troll': self._trolls}[token]
             return not board
 
         def check_mobilized():
             """True if all dwarfs form one connected component."""
-            pieces = self.dwarfs.get_bits()
-            first = next(pieces, None)
-            if first is None:
+            dwarfs = self._dwarfs
+            if not dwarfs:
                 return False
-            openset = [first]
-            closedset = []
-            while openset:
-                closedset.append(openset[0])
-                for i in self.tokens_adjacent(openset[0], 'dwarf'):
-                    if i not in closedset:
-                        openset.append(i)
-                del openset[0]
-            return len(set(closedset)) == len(self.dwarfs)
+            return self._flood(dwarfs & -dwarfs, dwarfs) == dwarfs
 
         def check_thudstone_saved():
             """Dwarf KVT win: thudstone reached row 1 between files F and K."""
-            stone = list(self.thudstone.get_bits())
+            stone = self.thudstone.positions()
             if not stone:
                 return False
             goal_squares = list(map(Ply.tuple_to_position, [(6,1),(7,1),(8,1),(9,1),(10,1)]))
@@ -405,7 +670,7 @@ class Gameboard:
 
         def check_thudstone_captured():
             """Troll KVT win: thudstone surrounded by 3+ trolls."""
-            stone = list(self.thudstone.get_bits())
+            stone = self.thudstone.positions()
             if not stone:
                 return False
             return len(self.tokens_adjacent(stone[0], 'troll')) >= 3
@@ -452,17 +717,70 @@ class Gameboard:
             if self.token_at(pos) == 'empty':
                 yield Ply('troll', pos, pos, [])
 
+    def ordered_plies(self, token, hints=None, plies=None):
+        """Yield ``token``'s legal plies best-first, for searches that prune.
+
+        Order: captures, most pieces taken first; then the quiet moves
+        named in ``hints.killers`` that are legal here; then the remaining
+        quiet moves, highest ``hints.history[(token, origin, dest)]``
+        first. Ties keep generation order. ``hints`` is any object with
+        ``killers`` and ``history`` attributes (see ``thud.search.MoveHints``);
+        without it, quiet moves come in generation order.
+
+        Captures are yielded before the quiet moves are generated, so a
+        consumer that stops early never pays for them. Pass ``plies`` to
+        order an existing candidate list instead of generating.
+        """
+        if plies is None:
+            caps = list(self.find_caps(token))
+        else:
+            plies = list(plies)
+            caps = [p for p in plies if p.captured]
+        caps.sort(key=lambda p: len(p.captured), reverse=True)
+        yield from caps
+
+        if plies is None:
+            quiet = list(self.find_moves(token))
+            if token == 'troll':
+                quiet.extend(self.find_materializations())
+        else:
+            quiet = [p for p in plies if not p.captured]
+        if hints is None:
+            yield from quiet
+            return
+
+        by_key = {}
+        for p in quiet:
+            by_key.setdefault((p.token, p.origin, p.dest), p)
+        yielded = set()
+        for k in hints.killers:
+            key = (k.token, k.origin, k.dest)
+            if key in by_key and key not in yielded:
+                yielded.add(key)
+                yield by_key[key]
+        history = hints.history
+        quiet.sort(key=lambda p: history.get((p.token, p.origin, p.dest), 0),
+                   reverse=True)
+        for p in quiet:
+            if (p.token, p.origin, p.dest) not in yielded:
+                yield p
+
     def troll_material(self):
         """Material differential from the troll's perspective using the
         official Thud scoring weight (dwarfs 1 each, trolls 4 each)."""
-        return 4 * len(self.trolls) - len(self.dwarfs)
+        return 4 * self.troll_count - self.dwarf_count
 
     def has_legal_move(self, token):
         """True if ``token`` has any legal move, capture, or (klash)
-        materialization available right now."""
-        for _ in self.find_caps(token):
+        materialization available right now.
+
+        A piece with an empty neighbour always has a move (a one-square
+        step), so one dilation settles nearly every position; the
+        generators only run for a side boxed in on every square.
+        """
+        if dilate(self._pieces(token)) & self._empty():
             return True
-        for _ in self.find_moves(token):
+        for _ in self.find_caps(token):
             return True
         if token == 'troll':
             for _ in self.find_materializations():
@@ -480,25 +798,33 @@ class Gameboard:
             winner = 'draw'
         return {'winner': winner, 'score': score, 'reason': reason}
 
-    def result(self, max_plies=DEFAULT_MAX_PLIES):
+    def result(self, max_plies=DEFAULT_MAX_PLIES,
+               max_repetitions=DEFAULT_MAX_REPETITIONS,
+               max_quiet_plies=DEFAULT_MAX_QUIET_PLIES):
         """Return a scored terminal descriptor, or None if still in play.
 
         The descriptor is ``{'winner', 'score', 'reason'}``: winner is
         'dwarf' / 'troll' / 'draw', score is the troll-perspective
         material differential (4*trolls - dwarfs), and reason is:
 
-          'win'     - an engine win condition fired (rout / KVT objective /
-                      klash mobilization); winner is that side.
-          'no-move' - the side to move has no legal move; the battle is
-                      over and decided on surviving material (Thud's real
-                      ending, and a stalemate guard).
-          'cutoff'  - the no-progress move cap was hit (self-play only);
-                      decided on material.
+          'win'        - an engine win condition fired (rout / KVT
+                         objective / klash mobilization); winner is that
+                         side.
+          'no-move'    - the side to move has no legal move; the battle
+                         is over and decided on surviving material
+                         (Thud's real ending, and a stalemate guard).
+          'repetition' - the position has now occurred
+                         ``max_repetitions`` times (self-play only);
+                         decided on material.
+          'cutoff'     - a no-progress cap was hit (self-play only):
+                         ``max_plies`` plies in all, or
+                         ``max_quiet_plies`` in a row without a capture;
+                         decided on material.
 
         Unlike get_game_outcome (which detects rout only and can stay None
         forever), this always becomes non-None eventually, so AI-vs-AI and
-        ML self-play cannot hang. Pass ``max_plies=None`` to disable the
-        cutoff (e.g. interactive human play).
+        ML self-play cannot hang. Pass None for a limit to disable it, and
+        for all three for interactive human play.
         """
         winner = self.get_game_outcome()
         if winner:
@@ -507,77 +833,132 @@ class Gameboard:
                     'reason': 'win'}
         if not self.has_legal_move(self.turn_to_act()):
             return self._scored_terminal('no-move')
-        if max_plies is not None and len(self.ply_list) >= max_plies:
+        if max_repetitions is not None and self.repetitions() >= max_repetitions:
+            return self._scored_terminal('repetition')
+        if ((max_plies is not None and len(self.ply_list) >= max_plies)
+                or (max_quiet_plies is not None
+                    and self.quiet_plies >= max_quiet_plies)):
             return self._scored_terminal('cutoff')
         return None
 
+    def _pieces(self, token):
+        return {'troll': self._trolls, 'dwarf': self._dwarfs,
+                'thudstone': self._thudstone}[token]
+
     def make_set(self, direction, distance, destinations):
         """Convert a set of destination positions into (origin, dest, direction) triples."""
         return [(i - direction * distance, i, direction) for i in destinations]
 
-    def find_moves(self, token):
+    def find_moves(self, token, codes=False):
         """Yield every legal (non-capture) move for every piece of ``token``.
 
         Uses bitboard shifts to enumerate destinations directly; doesn't
-        need to call validate_move per candidate.
+        need to call validate_move per candidate. With ``codes``, yields
+        :meth:`Ply.to_code` ints instead of Ply objects.
         """
         max_dist = {'troll': 1, 'dwarf': 15, 'thudstone': 0}[token]
+        pieces = self._pieces(token)
+        empty = self._empty()
+        # A quiet move's code is the token's code plus origin and dest.
+        base = Ply.encode(token, 0, 0) if codes else 0
 
         for d in self.cycle_direction():
-            shift = {
-                'troll': copy.deepcopy(self.trolls),
-                'dwarf': copy.deepcopy(self.dwarfs),
-                'thudstone': copy.deepcopy(self.thudstone),
-                }[token]
+            ray = pieces
             for dist in range(1, max_dist + 1):
-                if d > 0:
-                    shift = (shift >> d) & ~self.occupied_squares() & self.playable
-                elif d < 0:
-                    shift = (shift << abs(d)) & ~self.occupied_squares() & self.playable
-                moves = self.make_set(d, dist, frozenset(shift.get_bits()))
+                ray = shift(ray, d) & empty
+                moves = self.make_set(d, dist, frozenset(iter_bits(ray)))
                 if not moves:
                     break
-                for i in moves:
-                    yield Ply(token, i[0], i[1], [])
+                if codes:
+                    for i in moves:
+                        yield base | (i[0] << 18) | (i[1] << 9)
+                else:
+                    for i in moves:
+                        yield Ply(token, i[0], i[1], [])
 
-    def find_caps(self, token):
+    def find_caps(self, token, codes=False):
         """Yield every legal capture for every piece of ``token``.
 
-        Bitboard shifts narrow the candidate set; validate_move is called
-        per candidate to apply the full capture rules.
+        Classic/Klash captures are found with bitboard operations alone
+        (see :meth:`_find_line_caps`). KVT narrows candidates with
+        bitboard shifts and calls validate_move on each to apply its
+        capture rules. With ``codes``, yields :meth:`Ply.to_code` ints
+        instead of Ply objects.
         """
+        emit = Ply.encode if codes else Ply
+        if self.ruleset != 'kvt':
+            if token in ('dwarf', 'troll'):
+                yield from self._find_line_caps(token, emit)
+            return
+        pieces = self._pieces(token)
+        empty = self._empty()
+        # Dwarf rays run over empty squares and trolls (the capture targets).
+        empty_or_troll = empty | self._trolls
         for d in self.cycle_direction():
-            shift = {
-                'troll': copy.deepcopy(self.trolls),
-                'dwarf': copy.deepcopy(self.dwarfs),
-                'thudstone': copy.deepcopy(self.thudstone),
-                }[token]
+            ray = pieces
             for dist in range(1, 7):
                 if token == 'troll':
-                    if d > 0:
-                        shift = (shift >> d) & ~self.occupied_squares() & self.playable
-                    elif d < 0:
-                        shift = (shift << abs(d)) & ~self.occupied_squares() & self.playable
-                    moves = self.make_set(d, dist, frozenset(shift.get_bits()))
+                    ray = shift(ray, d) & empty
+                    moves = self.make_set(d, dist, frozenset(iter_bits(ray)))
                     if not moves:
                         break
                     for i in moves:
                         result = self.validate_move(i[0], i[1], False, True)
                         if result[1]:
-                            yield Ply(token, i[0], i[1], result[2])
+                            yield emit(token, i[0], i[1], result[2])
                 elif token == 'dwarf':
-                    if d > 0:
-                        shift = (shift >> d) & self.playable & (~self.occupied_squares() | self.trolls)
-                    elif d < 0:
-                        shift = (shift << abs(d)) & self.playable & (~self.occupied_squares() | self.trolls)
-                    moves = self.make_set(d, dist, frozenset(shift.get_bits()))
+                    ray = shift(ray, d) & empty_or_troll
+                    moves = self.make_set(d, dist, frozenset(iter_bits(ray)))
                     if not moves:
                         break
                     for i in moves:
-                        if self.trolls[i[1]]:
+                        if is_set(self._trolls, i[1]):
                             result = self.validate_move(i[0], i[1], False, True)
                             if result[1]:
-                                yield Ply(token, i[0], i[1], result[2])
+                                yield emit(token, i[0], i[1], result[2])
+
+    def _find_line_caps(self, token, emit):
+        """Classic/Klash captures for ``token``, without validate_move.
+
+        A piece hurls (dwarf) or shoves (troll) ``dist`` squares when it
+        heads a line of ``dist`` of its own: ``line`` holds those heads,
+        one shift-AND per step. Walking the heads ``dist - 1`` steps over
+        empty squares and one more onto a target square -- a troll for a
+        dwarf, an empty square next to a dwarf for a troll -- gives
+        exactly the capturing destinations. Yields in the same order as
+        the validate_move loop (the destinations of ``ray``, filtered),
+        so callers see no difference. ``emit`` builds each result (Ply or
+        Ply.encode).
+        """
+        own, empty = self._pieces(token), self._empty()
+        if token == 'troll':
+            targets = dilate(self._dwarfs) & empty
+            over = empty
+        else:
+            targets = self._trolls
+            # As in the validate_move loop, rays run on through trolls.
+            over = empty | targets
+        if not targets:
+            return
+        for d in self.cycle_direction():
+            ray = line = own
+            for dist in range(1, 7):
+                ray = shift(ray, d) & over
+                if dist > 1:
+                    line = own & shift(line, d)
+                if not ray or not line:
+                    break
+                landing = line
+                for _ in range(dist - 1):
+                    landing = shift(landing, d) & empty
+                landing = shift(landing, d) & targets
+                if not landing:
+                    continue
+                for dest in frozenset(iter_bits(ray)):
+                    if is_set(landing, dest):
+                        captured = (self.tokens_adjacent(dest, 'dwarf')
+                                    if token == 'troll' else [dest])
+                        yield emit(token, dest - d * dist, dest, captured)
 
     def find_setups(self, token, other_map=None):
         """Yield potential setup-moves (one-move-from-capture) for ``token``.
@@ -587,9 +968,9 @@ class Gameboard:
         """
         def pieces_within_reach(dest, pcs_locked):
             if token == 'troll':
-                available = set(self.trolls.get_bits()).difference(pcs_locked)
+                available = set(self.trolls.positions()).difference(pcs_locked)
             elif token == 'dwarf':
-                available = set(self.dwarfs.get_bits()).difference(pcs_locked)
+                available = set(self.dwarfs.positions()).difference(pcs_locked)
             reachable = []
             for i in available:
                 if self.validate_move(i, dest, True, False)[0]:
@@ -608,7 +989,7 @@ class Gameboard:
 
                 direction = self.get_direction(ply.dest, ply.origin)
                 iterator = ply.origin
-                while self.trolls[iterator]:
+                while is_set(self._trolls, iterator):
                     support_ready.append(iterator)
                     iterator += direction
 
@@ -644,32 +1025,27 @@ class Gameboard:
             return valid_support_plies
 
         def find_potential_setups():
+            pieces = self._pieces(token)
+            empty = self._empty()
+            empty_or_dwarf = empty | self._dwarfs
+            if other_map:
+                empty_or_target = empty | (self._playable & other_map.value)
             for d in self.cycle_direction():
-                shift = {
-                    'troll': copy.deepcopy(self.trolls),
-                    'dwarf': copy.deepcopy(self.dwarfs),
-                    'thudstone': copy.deepcopy(self.thudstone),
-                    }[token]
+                ray = pieces
                 for dist in range(1, 15):
                     if token == 'troll':
-                        if d > 0:
-                            shift = (shift >> d) & self.playable & (~self.occupied_squares() | self.dwarfs)
-                        elif d < 0:
-                            shift = (shift << abs(d)) & self.playable & (~self.occupied_squares() | self.dwarfs)
-                        moves = self.make_set(d, dist, frozenset(shift.get_bits()))
+                        ray = shift(ray, d) & empty_or_dwarf
+                        moves = self.make_set(d, dist, frozenset(iter_bits(ray)))
                         if not moves:
                             break
                         for i in moves:
-                            if self.dwarfs[i[1]]:
+                            if is_set(self._dwarfs, i[1]):
                                 yield Ply('troll', i[0], i[1], [])
                     if token == 'dwarf':
                         if not other_map:
                             return
-                        if d > 0:
-                            shift = (shift >> d) & self.playable & (~self.occupied_squares() | other_map)
-                        elif d < 0:
-                            shift = (shift << abs(d)) & self.playable & (~self.occupied_squares() | other_map)
-                        moves = self.make_set(d, dist, frozenset(shift.get_bits()))
+                        ray = shift(ray, d) & empty_or_target
+                        moves = self.make_set(d, dist, frozenset(iter_bits(ray)))
                         if not moves:
                             break
                         for i in moves:
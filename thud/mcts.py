@@ -0,0 +1,174 @@
+"""Monte Carlo Tree Search (UCT) move chooser.
+
+Grows a game tree one node per playout: descend by UCB1 to a node with
+untried plies, expand one (in ``Gameboard.ordered_plies`` order, so
+captures are tried first — Thud's branching factor is far too large to
+expand uniformly), play a short rollout with a pluggable policy, then back
+the result up the path. The answer is the root child visited most.
+
+Each playout runs on the caller's board and is undone with one
+``Gameboard.snapshot()`` / ``restore()`` pair, so there is no per-node or
+per-playout deep copy.
+
+    from thud.mcts import MCTS
+    ply = MCTS(playouts=500).best_move(board, 'troll')
+
+Rollout policies are callables ``policy(board, side, rng) -> Ply or None``
+(None: no legal move). Two are provided: :func:`random_policy` (uniform over
+legal plies) and :func:`heuristic_policy` (``AIEngine``'s lookahead-0
+choice — stronger, slower).
+"""
+
+import math
+import time
+
+from .ai_engine import AIEngine, _rng
+from .ply import NoMoveException
+
+
+DEFAULT_PLAYOUTS = 200
+# Plies per rollout before the position is scored on material.
+DEFAULT_ROLLOUT_DEPTH = 8
+# UCB1 exploration constant.
+DEFAULT_EXPLORATION = math.sqrt(2)
+# Material differential (troll's view) that maps to a ~73% win chance;
+# scales the logistic that turns an unfinished rollout into a reward.
+MATERIAL_SPREAD = 4.0
+
+
+def _other(side):
+    return 'dwarf' if side == 'troll' else 'troll'
+
+
+def random_policy(board, side, rng):
+    """Uniformly random legal ply for ``side``, or None if it has none."""
+    plies = list(board.ordered_plies(side))
+    return rng.choice(plies) if plies else None
+
+
+def heuristic_policy(board, side, rng):
+    """``AIEngine``'s greedy (lookahead 0) choice for ``side``."""
+    try:
+        return AIEngine.calculate_best_move(board, side, 0)
+    except NoMoveException:
+        return None
+
+
+ROLLOUT_POLICIES = {'random': random_policy, 'heuristic': heuristic_policy}
+
+
+class Node:
+    """One tree node: the ply that led here and its playout statistics.
+
+    ``value`` accumulates rewards from the point of view of ``side``, the
+    side that played ``ply``, which is what its parent maximizes over.
+    """
+
+    __slots__ = ('ply', 'parent', 'side', 'children', 'untried',
+                 'visits', 'value')
+
+    def __init__(self, ply, parent, side, untried):
+        self.ply = ply
+        self.parent = parent
+        self.side = side
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.value = 0.0
+
+    def select(self, exploration):
+        """Child maximizing UCB1."""
+        log_n = math.log(self.visits)
+        return max(self.children, key=lambda c: c.value / c.visits
+                   + exploration * math.sqrt(log_n / c.visits))
+
+
+class MCTS:
+    """UCT search with a configurable rollout policy and budget."""
+
+    def __init__(self, playouts=DEFAULT_PLAYOUTS, time_budget_ms=None,
+                 rollout='random', rollout_depth=DEFAULT_ROLLOUT_DEPTH,
+                 exploration=DEFAULT_EXPLORATION, rng=None):
+        self.playouts = playouts
+        self.time_budget_ms = time_budget_ms
+        self.policy = ROLLOUT_POLICIES.get(rollout, rollout)
+        if not callable(self.policy):
+            raise ValueError("unknown rollout policy: {!r}".format(rollout))
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.rng = rng if rng is not None else _rng
+        self.completed = 0
+
+    def reward(self, board):
+        """Troll-perspective reward in [0, 1] for the position reached."""
+        winner = board.get_game_outcome()
+        if winner:
+            return 1.0 if winner == 'troll' else 0.0
+        return 1.0 / (1.0 + math.exp(-board.troll_material() / MATERIAL_SPREAD))
+
+    def rollout(self, board, side):
+        """Play up to ``rollout_depth`` policy plies; return the reward."""
+        for _ in range(self.rollout_depth):
+            if board.get_game_outcome():
+                break
+            ply = self.policy(board, side, self.rng)
+            if not ply:
+                break
+            board.apply_ply(ply)
+            board.ply_list.append(ply)
+            side = _other(side)
+        return self.reward(board)
+
+    def playout(self, board, root):
+        """One select / expand / rollout / backpropagate pass from ``root``."""
+        snap = board.snapshot()
+        node = root
+        side = _other(root.side)
+        try:
+            while not node.untried and node.children:
+                node = node.select(self.exploration)
+                board.apply_ply(node.ply)
+                board.ply_list.append(node.ply)
+                side = _other(side)
+            if node.untried and not board.get_game_outcome():
+                ply = node.untried.pop(0)
+                board.apply_ply(ply)
+                board.ply_list.append(ply)
+                child = Node(ply, node, side,
+                             list(board.ordered_plies(_other(side))))
+                node.children.append(child)
+                node = child
+                side = _other(side)
+            reward = self.rollout(board, side)
+        finally:
+            board.restore(snap)
+        while node is not None:
+            node.visits += 1
+            node.value += reward if node.side == 'troll' else 1.0 - reward
+            node = node.parent
+
+    def best_move(self, board, side):
+        """Return ``side``'s most-visited root ply after the budget is spent.
+
+        Stops after ``playouts`` playouts or ``time_budget_ms``, whichever
+        comes first (either may be None, not both). ``board`` is left as it
+        was found. Raises ``NoMoveException`` if ``side`` has no legal ply.
+        """
+        root = Node(None, None, _other(side), list(board.ordered_plies(side)))
+        if not root.untried:
+            raise NoMoveException(side)
+        if len(root.untried) == 1:
+            return root.untried[0]
+
+        deadline = None
+        if self.time_budget_ms is not None:
+            deadline = time.perf_counter() + self.time_budget_ms / 1000.0
+        self.completed = 0
+        while self.playouts is None or self.completed < self.playouts:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            self.playout(board, root)
+            self.completed += 1
+        if not root.children:
+            return root.untried[0]
+        return max(root.children, key=lambda c: c.visits).ply
@@ -0,0 +1,146 @@
+"""Root-parallel move scoring across a process pool.
+
+Scoring root candidates is embarrassingly parallel: each one is played out
+(``AIEngine.predict_future``) or searched (``Searcher.negamax``) on its own.
+This module splits the candidate list into chunks, ships each chunk to a
+worker process together with the board's compact ``snapshot()`` tuple (not
+a pickled ``Gameboard`` and its ``ply_list``), and merges the scores back in
+candidate order, so ties resolve exactly as the serial loop would.
+
+The pool is created on first use and reused across moves; asking for a
+different worker count replaces it. Call :func:`shutdown` to release it.
+Each worker allocates one transposition table, the parent's size, when it
+starts, and every chunk clears and reuses it.
+
+Each chunk reseeds the worker's engine RNG from one draw of the parent's
+RNG plus the chunk's offset. The chunk size doesn't depend on the worker
+count (it is ``DEFAULT_CHUNKSIZE`` unless given), so a seeded game is
+reproducible whatever the worker count (though not identical to a serial
+game, whose playouts share one RNG stream).
+"""
+
+import concurrent.futures
+import os
+
+from . import ai_engine
+from .gameboard import Gameboard
+from .search import WIN_SCORE, Searcher
+from .transposition import TranspositionTable
+
+
+# Candidates per task when the caller doesn't say. Fixed rather than
+# derived from the worker count, which would change how the RNG is
+# reseeded and so the playouts of a seeded game.
+DEFAULT_CHUNKSIZE = 4
+
+_pool = None
+_pool_workers = None
+
+
+def get_pool(workers=None):
+    """Return the shared pool, (re)creating it for ``workers`` processes.
+
+    ``workers=None`` means one per CPU.
+    """
+    global _pool, _pool_workers
+    workers = workers or os.cpu_count() or 1
+    if _pool is None or _pool_workers != workers:
+        shutdown()
+        _pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(ai_engine.AIEngine.tt.size_mb(),))
+        _pool_workers = workers
+    return _pool
+
+
+def _init_worker(mb):
+    # The worker's own table, used by every chunk it runs; a forked worker
+    # would otherwise start with a copy of the parent's.
+    ai_engine.AIEngine.tt = TranspositionTable(mb)
+
+
+def shutdown():
+    """Shut the shared pool down (a later call creates a fresh one)."""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+    _pool, _pool_workers = None, None
+
+
+def _payload(board):
+    return (board.ruleset, board.snapshot(),
+            board.ply_list[-1] if board.ply_list else None)
+
+
+def _future_chunk(payload, plies, lookahead, token, seed):
+    """Worker: predict_future scores for ``plies``."""
+    board = Gameboard.from_snapshot(*payload)
+    ai_engine.seed(seed)
+    return [ai_engine.AIEngine.predict_future(board, p, lookahead, token)
+            for p in plies]
+
+
+def _search_chunk(payload, plies, depth, token):
+    """Worker: full-window negamax scores for ``plies``."""
+    board = Gameboard.from_snapshot(*payload)
+    # Cleared so a chunk's scores don't depend on which chunks the worker
+    # ran before it (ai_engine.seed does the same for _future_chunk).
+    tt = ai_engine.AIEngine.tt
+    tt.clear()
+    searcher = Searcher(depth=depth, tt=tt)
+    other = 'dwarf' if token == 'troll' else 'troll'
+    scores = []
+    for p in plies:
+        board.push(p)
+        try:
+            scores.append(-searcher.negamax(board, other, depth - 1,
+                                            -WIN_SCORE - 1, WIN_SCORE + 1))
+        finally:
+            board.pop()
+    return scores
+
+
+def _chunks(plies, chunksize):
+    chunksize = chunksize or DEFAULT_CHUNKSIZE
+    return [(i, plies[i:i + chunksize]) for i in range(0, len(plies), chunksize)]
+
+
+def _best(plies, scores):
+    best_score, best_ply = None, None
+    for ply, score in zip(plies, scores):
+        if best_score is None or score > best_score:
+            best_score, best_ply = score, ply
+    return best_ply, best_score
+
+
+def select_best_future(board, plies, lookahead, token, workers=None,
+                       chunksize=None, hints=None):
+    """Parallel ``AIEngine.select_best_future``: same candidates, same order
+    (``hints`` included), every one played out (there is no shared best
+    score to prune against)."""
+    plies = list(board.ordered_plies(token, hints, plies=plies))
+    if not plies:
+        return None
+    pool = get_pool(workers)
+    payload = _payload(board)
+    seed = ai_engine._rng.getrandbits(64)
+    futures = [pool.submit(_future_chunk, payload, chunk, lookahead, token,
+                           seed + offset)
+               for offset, chunk in _chunks(plies, chunksize)]
+    scores = [s for f in futures for s in f.result()]
+    return _best(plies, scores)[0]
+
+
+def search_best_move(board, token, depth, workers=None, chunksize=None):
+    """Root-split ``Searcher.best_move``: each worker searches its share of
+    the root plies to ``depth`` with a full window. Returns ``(ply, score)``;
+    ``(None, None)`` if ``token`` has no legal ply."""
+    plies = list(board.ordered_plies(token))
+    if not plies:
+        return None, None
+    pool = get_pool(workers)
+    payload = _payload(board)
+    futures = [pool.submit(_search_chunk, payload, chunk, depth, token)
+               for _, chunk in _chunks(plies, chunksize)]
+    scores = [s for f in futures for s in f.result()]
+    return _best(plies, scores)
@@ -0,0 +1,147 @@
+"""Perft: count the positions the move generators reach to a fixed depth.
+
+The move generators (``find_caps`` / ``find_moves`` /
+``find_materializations``) are being optimized, and a perft count is the
+cheapest way to catch a generator that changed what it produces. It walks
+every legal ply of the side to move, depth plies deep, making and
+unmaking plies with ``Gameboard.push`` / ``pop``, and counts the leaves.
+It also gives a throughput figure (nodes/sec) that can be compared across
+releases.
+
+The plies are the ones the engines choose from: captures, moves and (for
+trolls) Klash materializations. KVT thudstone moves are left out, as they
+are in the AI. A decided position (``get_game_outcome``) is a leaf with
+no continuations, like a checkmate in chess perft.
+
+    from thud import perft
+    perft.perft(Gameboard('classic'), 2)
+    # -> 22624
+
+From the shell::
+
+    python -m thud.perft --depth 3                  # the three start positions
+    python -m thud.perft --depth 2 open.thud        # positions from game files
+    python -m thud.perft --depth 2 --divide open.thud
+
+``--divide`` ("split perft") prints the count under each root ply. When
+two builds disagree, it shows which root ply to follow down.
+"""
+
+import argparse
+import sys
+import time
+
+from .gameboard import Gameboard
+from .ply import Ply
+
+RULESETS = ('classic', 'kvt', 'klash')
+
+
+def legal_plies(board, codes=False):
+    """Every ply the side to move can play, in generator order (as
+    :meth:`Ply.to_code` ints with ``codes``)."""
+    side = board.turn_to_act()
+    plies = list(board.find_caps(side, codes))
+    plies.extend(board.find_moves(side, codes))
+    if side == 'troll':
+        plies.extend(p.to_code() if codes else p
+                     for p in board.find_materializations())
+    return plies
+
+
+def perft(board, depth):
+    """Number of leaf positions ``depth`` plies below ``board``.
+
+    ``board`` is left as it was found.
+    """
+    if depth <= 0:
+        return 1
+    if board.get_game_outcome():
+        return 0
+    if depth == 1:
+        # Bulk count: the leaves are the plies themselves, and move codes
+        # are enough to count them.
+        return len(legal_plies(board, codes=True))
+    nodes = 0
+    for ply in legal_plies(board):
+        board.push(ply)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def divide(board, depth):
+    """Split perft: ``[(ply, count), ...]`` for each root ply, in
+    generator order; the counts sum to ``perft(board, depth)``."""
+    if depth <= 0 or board.get_game_outcome():
+        return []
+    counts = []
+    for ply in legal_plies(board):
+        board.push(ply)
+        counts.append((ply, perft(board, depth - 1)))
+        board.pop()
+    return counts
+
+
+def load(path, ruleset='classic'):
+    """Board after replaying the plies in a ``.thud`` game file.
+
+    Blank lines and the comma-separated starting-position line are
+    skipped; raises ValueError on a line that isn't a ply.
+    """
+    board = Gameboard(ruleset)
+    with open(path) as f:
+        for line in f:
+            move = line.strip()
+            if not move or ',' in move:
+                continue
+            ply = Ply.parse_string(move)
+            if not ply:
+                raise ValueError('{}: not a ply: {!r}'.format(path, move))
+            board.push(ply)
+    return board
+
+
+def _report(name, board, depth, split):
+    if split:
+        total = 0
+        for ply, count in divide(board, depth):
+            print('{} {}'.format(ply, count))
+            total += count
+        print('{} depth {}: {} nodes'.format(name, depth, total))
+        return
+    for d in range(1, depth + 1):
+        start = time.perf_counter()
+        nodes = perft(board, d)
+        elapsed = time.perf_counter() - start
+        print('{} depth {}: {} nodes in {:.2f}s ({:.0f} nodes/sec)'.format(
+            name, d, nodes, elapsed, nodes / elapsed if elapsed else 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m thud.perft',
+        description='Count move-generator leaf nodes to a fixed depth.')
+    parser.add_argument('files', nargs='*', metavar='game.thud',
+                        help='start from these games (default: each '
+                             "ruleset's opening position)")
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--ruleset', choices=RULESETS,
+                        help='only this ruleset (files default to classic)')
+    parser.add_argument('--divide', action='store_true',
+                        help='print the count under each root ply')
+    args = parser.parse_args(argv)
+
+    if args.files:
+        positions = [(path, load(path, args.ruleset or 'classic'))
+                     for path in args.files]
+    else:
+        positions = [(ruleset, Gameboard(ruleset))
+                     for ruleset in ([args.ruleset] if args.ruleset else RULESETS)]
+    for name, board in positions:
+        _report(name, board, args.depth, args.divide)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
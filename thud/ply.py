@@ -3,15 +3,30 @@
 A ``Ply`` carries the side moving (``token``), the origin and destination
 squares (as 0..288 integer positions), and a list of captured-piece
 positions. ``Ply.parse_string`` and ``str(ply)`` round-trip the textual
-game-notation used in .thud save files.
+game-notation used in .thud save files; ``Ply.to_code`` and
+``Ply.from_code`` round-trip a packed integer form for binary logs, the
+transposition table, and generators that don't need Ply objects.
 
 ``NoMoveException`` lives here because it's a game-primitive concern (no
 legal moves exist for a side) rather than something specific to one engine.
 """
 
+import functools
 import math
 import re
 
+from .bitboard import N
+from .rays import DIRECTIONS
+
+
+# Move code: | token : 2 | origin : 9 | dest : 9 | captures dest : 1 | captures around dest : 8 |
+_CODE_TOKENS = (None, 'dwarf', 'troll', 'thudstone')
+_TOKEN_CODES = {'dwarf': 1, 'troll': 2, 'thudstone': 3}
+_CAPTURES_DEST = 1 << 8
+# Gameboard.cycle_direction order, so decoded captures list in the order
+# the move generators produce them.
+_CAPTURE_BITS = {d: 1 << i for i, d in enumerate(DIRECTIONS)}
+
 
 class NoMoveException(Exception):
     """Raised when the side to act has no legal move."""
@@ -28,6 +43,9 @@ class Ply:
     it is intentionally not part of structural equality.
     """
 
+    # Generators make thousands per turn; no per-instance __dict__.
+    __slots__ = ('token', 'origin', 'dest', 'captured', 'score')
+
     abbr = {'dwarf': 'd', 'd': 'd',
             'troll': 'T', 'T': 'T',
             'thudstone': 'R', 'R': 'R'}
@@ -52,12 +70,7 @@ class Ply:
         return (self.token, self.origin, self.dest, tuple(sorted(self.captured)))
 
     def __str__(self):
-        cap_string = ''.join('x' + self.position_to_notation(cap)
-                             for cap in self.captured)
-        return (str(self.abbr.get(self.token))
-                + str(self.position_to_notation(self.origin)) + '-'
-                + str(self.position_to_notation(self.dest))
-                + cap_string)
+        return _format(self.token, self.origin, self.dest, tuple(self.captured))
 
     def __repr__(self):
         return "Ply({!r}, {!r}, {!r}, {!r})".format(
@@ -81,6 +94,53 @@ class Ply:
                 and self.origin is not None
                 and self.dest is not None)
 
+    @staticmethod
+    def parse_many(lines):
+        """Parse a whole game's (or archive's) worth of lines at once.
+
+        Returns one entry per line, a Ply or None exactly as
+        :meth:`parse_string` would give, without its per-call overhead.
+        """
+        parse = _parse
+        plies = []
+        append = plies.append
+        for line in lines:
+            parsed = parse(line)
+            append(None if parsed is None else Ply(*parsed))
+        return plies
+
+    @staticmethod
+    def format_many(plies):
+        """``[str(p) for p in plies]``, for a whole ply list at once."""
+        return [_format(p.token, p.origin, p.dest, tuple(p.captured))
+                for p in plies]
+
+    @staticmethod
+    def encode(token, origin, dest, captured=()):
+        """Move code for a ply, without building the Ply (see :meth:`to_code`)."""
+        caps = 0
+        for c in captured:
+            caps |= _CAPTURES_DEST if c == dest else _CAPTURE_BITS[c - dest]
+        return (_TOKEN_CODES[token] << 27) | (origin << 18) | (dest << 9) | caps
+
+    def to_code(self):
+        """Pack into a non-zero 29-bit move code.
+
+        Every capture in every ruleset is either the destination itself (a
+        dwarf's hurl, a klash materialization) or a neighbour of it (troll
+        shoves, KVT captures), so captures fit a self bit plus a mask of the
+        eight directions around ``dest``.
+        """
+        return Ply.encode(self.token, self.origin, self.dest, self.captured)
+
+    @staticmethod
+    def from_code(code):
+        """Inverse of :meth:`to_code`."""
+        dest = (code >> 9) & 0x1ff
+        captured = [dest] if code & _CAPTURES_DEST else []
+        captured.extend(dest + d for d, b in _CAPTURE_BITS.items() if code & b)
+        return Ply(_CODE_TOKENS[code >> 27], (code >> 18) & 0x1ff, dest, captured)
+
     @staticmethod
     def position_to_tuple(position):
         """Integer position -> (file, rank). Inverse of tuple_to_position."""
@@ -96,6 +156,11 @@ class Ply:
         rank outside 1..15), rather than concatenating a None file into the
         string with a confusing TypeError.
         """
+        if type(position) is int and 0 <= position < N:
+            notation = _NOTATIONS[position]
+            if notation is None:
+                raise ValueError("off-board position: {!r}".format(position))
+            return notation
         file, rank = Ply.position_to_tuple(position)
         letter = Ply.to_letter.get(int(file))
         if letter is None or not (1 <= int(rank) <= 15):
@@ -109,6 +174,9 @@ class Ply:
         Raises ValueError if the file letter is not A-P (excluding I) or the
         rank is outside 1..15 — i.e. anything off the labelled board.
         """
+        position = _POSITIONS.get(notation) if type(notation) is str else None
+        if position is not None:
+            return position
         file = Ply.to_number.get(notation[0])
         if file is None:
             raise ValueError("bad file in notation: {!r}".format(notation))
@@ -144,16 +212,77 @@ class Ply:
         """Parse one ply of game notation (e.g. 'dF1-G2', 'TG7-F7xE7').
 
         Returns ``None`` if the string does not match the ply grammar or
-        names an off-board square (in the move or any capture).
+        names an off-board square (in the move or any capture). Parses are
+        cached per string; each call still returns a new Ply.
         """
-        m = Ply._PLY_NOTATION_RE.search(str(ply_notation))
-        if not m:
-            return None
-        try:
-            origin = Ply.notation_to_position(m.group(2) + m.group(3))
-            dest = Ply.notation_to_position(m.group(4) + m.group(5))
-            captures = [Ply.notation_to_position(c)
-                        for c in m.group(6).split('x')[1:]]
-        except ValueError:
+        parsed = _parse(str(ply_notation))
+        if parsed is None:
             return None
-        return Ply(Ply._SIDE_FROM_ABBR.get(m.group(1)), origin, dest, captures)
+        token, origin, dest, captures = parsed
+        return Ply(token, origin, dest, captures)
+
+
+# Square names by position ('A1'-style; None off the labelled 15x15
+# grid), and positions by name.
+_NOTATIONS = tuple(
+    Ply.to_letter[p % 17] + str(p // 17)
+    if p % 17 in Ply.to_letter and 1 <= p // 17 <= 15 else None
+    for p in range(N))
+_POSITIONS = {notation: p for p, notation in enumerate(_NOTATIONS) if notation}
+
+# The ply strings a game can produce are a small finite set, and the
+# server, the save files and the logs see the same ones over and over.
+_CACHE_SIZE = 1 << 15
+
+
+def _split(move):
+    """Ply fields of a plain-form ply (token, origin-dest, captures), or
+    None if ``move`` isn't exactly that form."""
+    token = Ply._SIDE_FROM_ABBR.get(move[:1])
+    if token is None:
+        return None
+    body = move[2:] if move[1:2] == ' ' else move[1:]
+    origin, dash, rest = body.partition('-')
+    origin = _POSITIONS.get(origin)
+    if origin is None or not dash:
+        return None
+    if 'x' not in rest:
+        dest = _POSITIONS.get(rest)
+        return None if dest is None else (token, origin, dest, ())
+    squares = tuple(_POSITIONS.get(n) for n in rest.split('x'))
+    if None in squares:
+        return None
+    return token, origin, squares[0], squares[1:]
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _parse(notation):
+    """Ply.parse_string's work, as (token, origin, dest, captures) or None.
+
+    Plies in the plain save-file form (``dF1-G2``, ``TG7-F7xE7``) are
+    split on ``-`` and ``x`` and their squares looked up in the table;
+    anything else goes through the regex.
+    """
+    parsed = _split(notation.strip())
+    if parsed is not None:
+        return parsed
+    m = Ply._PLY_NOTATION_RE.search(notation)
+    if not m:
+        return None
+    try:
+        origin = Ply.notation_to_position(m.group(2) + m.group(3))
+        dest = Ply.notation_to_position(m.group(4) + m.group(5))
+        captures = tuple(Ply.notation_to_position(c)
+                         for c in m.group(6).split('x')[1:])
+    except ValueError:
+        return None
+    return (Ply._SIDE_FROM_ABBR.get(m.group(1)), origin, dest, captures)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _format(token, origin, dest, captured):
+    """str(Ply)'s work."""
+    to_notation = Ply.position_to_notation
+    return (str(Ply.abbr.get(token)) + to_notation(origin) + '-'
+            + to_notation(dest)
+            + ''.join('x' + to_notation(cap) for cap in captured))
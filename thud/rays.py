@@ -0,0 +1,73 @@
+"""Precomputed ray tables for the 17x17 grid.
+
+For every square and each of the eight king-step directions, the squares
+met walking that way to the edge of the grid, nearest first, and the same
+squares as a raw mask (``thud.bitboard`` bit order). Rays stop at the grid
+edge and never wrap between edge files; whether a square is *playable* is
+the ruleset's business, so callers AND with the board's playable mask.
+
+``Gameboard`` uses these to answer "what lies between these two squares"
+and "what's next to this square" with a lookup instead of rebuilding
+``range()`` walks and (file, rank) tuples per query.
+"""
+
+from .bitboard import BOARD_WIDTH, N, mask_of
+
+
+# Gameboard.cycle_direction order.
+DIRECTIONS = (-BOARD_WIDTH - 1, -BOARD_WIDTH, -BOARD_WIDTH + 1,
+              BOARD_WIDTH - 1, BOARD_WIDTH, BOARD_WIDTH + 1, -1, 1)
+# (file, rank) step of each direction.
+STEPS = {-BOARD_WIDTH - 1: (-1, -1), -BOARD_WIDTH: (0, -1), -BOARD_WIDTH + 1: (1, -1),
+         BOARD_WIDTH - 1: (-1, 1), BOARD_WIDTH: (0, 1), BOARD_WIDTH + 1: (1, 1),
+         -1: (-1, 0), 1: (1, 0)}
+# Inverse of STEPS, plus (0, 0) -> 0 as Gameboard.delta_to_direction has it.
+DIRECTION_OF = {step: d for d, step in STEPS.items()}
+DIRECTION_OF[(0, 0)] = 0
+
+FILE = tuple(p % BOARD_WIDTH for p in range(N))
+RANK = tuple(p // BOARD_WIDTH for p in range(N))
+
+
+def _ray(p, d):
+    df, dr = STEPS[d]
+    f, r = FILE[p] + df, RANK[p] + dr
+    squares = []
+    while 0 <= f < BOARD_WIDTH and 0 <= r < BOARD_WIDTH:
+        squares.append(r * BOARD_WIDTH + f)
+        f, r = f + df, r + dr
+    return tuple(squares)
+
+
+# RAYS[d][p]: squares from p (exclusive) toward d, nearest first.
+RAYS = {d: tuple(_ray(p, d) for p in range(N)) for d in DIRECTIONS}
+RAY_MASKS = {d: tuple(mask_of(ray) for ray in RAYS[d]) for d in DIRECTIONS}
+# NEIGHBOURS[p]: p's grid neighbours, in DIRECTIONS order.
+NEIGHBOURS = tuple(tuple(RAYS[d][p][0] for d in DIRECTIONS if RAYS[d][p])
+                   for p in range(N))
+NEIGHBOUR_MASKS = tuple(mask_of(n) for n in NEIGHBOURS)
+
+
+def sign(x):
+    return (x > 0) - (x < 0)
+
+
+def direction(origin, dest):
+    """1-step direction from ``origin`` toward ``dest`` (0 if equal).
+
+    Like ``Gameboard.get_direction``: for squares not on a common line
+    this is the step with the same file/rank signs.
+    """
+    return DIRECTION_OF[(sign(FILE[dest] - FILE[origin]),
+                         sign(RANK[dest] - RANK[origin]))]
+
+
+def steps(origin, dest):
+    """Number of king steps from ``origin`` to ``dest`` along their common
+    line, or None if they don't share a rank, file or diagonal (or are the
+    same square)."""
+    df = FILE[dest] - FILE[origin]
+    dr = RANK[dest] - RANK[origin]
+    if (df or dr) and (not df or not dr or abs(df) == abs(dr)):
+        return max(abs(df), abs(dr))
+    return None
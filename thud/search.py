@@ -0,0 +1,253 @@
+"""Alpha-beta negamax search over the Gameboard move generators.
+
+An alternative to ``AIEngine``'s heuristic chooser: instead of replaying a
+heuristic game per candidate, it searches the game tree to a fixed depth
+over ``find_caps`` / ``find_moves`` / ``find_materializations``, making and
+unmaking plies in place with ``Gameboard.push`` / ``pop``. Results go into
+the shared transposition table, so re-searches and transpositions are cheap.
+
+Positions are scored by ``troll_material()`` plus any number of pluggable
+terms. A term is a ``(weight, fn)`` pair where ``fn(board)`` returns a
+troll-perspective number; weights are in material units (1 = one dwarf).
+
+    from thud.search import Searcher
+    ply, score = Searcher(depth=3).best_move(board, 'dwarf')
+
+``AIEngine.calculate_best_move(board, token, lookahead, engine='search')``
+uses this with ``depth = lookahead + 1`` (the candidate ply plus
+``lookahead`` replies, matching the heuristic's lookahead).
+
+For a guaranteed response time use :meth:`Searcher.iterative_deepening`
+(``calculate_best_move(..., time_budget_ms=...)``): it searches depth 1,
+2, 3, ... and, when the wall-clock budget runs out, abandons the current
+iteration and answers with the last completed one.
+"""
+
+import time
+
+from . import zobrist
+from .ply import NoMoveException
+from .transposition import EXACT, LOWER, UPPER, TranspositionTable, pack_move
+
+
+# Evaluation is in hundredths of a dwarf so fractional terms survive the
+# transposition table's integer scores.
+MATERIAL_SCALE = 100
+# A decided game outscores any material swing (and still fits the table's
+# 16-bit score field).
+WIN_SCORE = 30000
+# Keeps search entries apart from AIEngine.predict_future's entries when
+# both share one table: the two store different kinds of score.
+_KEY_SALT = 0x5ea4c4e5ea4c4e5
+# Iterative deepening stops here even with time to spare.
+MAX_DEPTH = 32
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the iterative-deepening deadline passes."""
+
+
+def dwarf_cohesion(board):
+    """Troll-perspective term: minus the number of adjacent dwarf pairs.
+
+    Dwarfs in contact can form throwing lines and are harder to shove
+    into; scattered dwarfs are troll food. Counted with one shift-and-AND
+    per direction (the off-board frame stops wraparound).
+    """
+    v = board.dwarfs.value
+    return -sum((v & (v >> d)).bit_count() for d in (1, 16, 17, 18))
+
+
+DEFAULT_TERMS = ((0.05, dwarf_cohesion),)
+
+
+def _other(side):
+    return 'dwarf' if side == 'troll' else 'troll'
+
+
+class MoveHints:
+    """Quiet-move ordering hints for ``Gameboard.ordered_plies``.
+
+    ``killers`` are quiet plies that recently caused a cutoff at the same
+    distance from the root (they are often good in sibling positions);
+    ``history`` maps ``(token, origin, dest)`` to a score that grows each
+    time that move causes a cutoff anywhere in the tree.
+    """
+
+    def __init__(self, killers=None, history=None, slots=2):
+        self.killers = killers if killers is not None else []
+        self.history = history if history is not None else {}
+        self.slots = slots
+
+    def cutoff(self, ply, depth):
+        """Credit quiet ``ply`` with a cutoff found ``depth`` plies from the leaves."""
+        if ply.captured:
+            return  # captures are already ordered first
+        key = (ply.token, ply.origin, ply.dest)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+        if ply not in self.killers:
+            self.killers.insert(0, ply)
+            del self.killers[self.slots:]
+
+
+class Searcher:
+    """Fixed-depth negamax with alpha-beta pruning and a transposition table."""
+
+    def __init__(self, depth=2, terms=DEFAULT_TERMS, tt=None):
+        self.depth = depth
+        self.terms = tuple(terms)
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.nodes = 0
+        self.completed_depth = 0
+        self._deadline = None
+        # Killers are kept per ply count (distance from the game start,
+        # which is distance from the root plus a constant); history is
+        # shared by the whole tree.
+        self._killers = {}
+        self._history = {}
+
+    def _hints(self, board):
+        return MoveHints(self._killers.setdefault(len(board.ply_list), []),
+                         self._history)
+
+    def evaluate(self, board, side):
+        """Static score of ``board`` from ``side``'s point of view."""
+        score = board.troll_material()
+        for weight, fn in self.terms:
+            score += weight * fn(board)
+        score = int(round(score * MATERIAL_SCALE))
+        return score if side == 'troll' else -score
+
+    def _key(self, board, side):
+        key = board.zobrist ^ _KEY_SALT ^ zobrist.rules_key(board)
+        if side != board.turn_to_act():
+            key ^= zobrist.SIDE
+        return key
+
+    def plies(self, board, side, hint=0):
+        """Every legal ply for ``side``, best-first: the table's move, then
+        ``Gameboard.ordered_plies`` order (captures, killers, history)."""
+        plies = list(board.ordered_plies(side, self._hints(board)))
+        if hint:
+            for i, p in enumerate(plies):
+                if pack_move(p) == hint:
+                    plies.insert(0, plies.pop(i))
+                    break
+        return plies
+
+    def negamax(self, board, side, depth, alpha, beta):
+        """Score of ``board`` for ``side`` (to move), searched ``depth`` plies."""
+        self.nodes += 1
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        winner = board.get_game_outcome()
+        if winner:
+            return WIN_SCORE if winner == side else -WIN_SCORE
+        if depth <= 0:
+            return self.evaluate(board, side)
+
+        key = self._key(board, side)
+        hint = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            score, entry_depth, bound, hint = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return score
+                elif bound == LOWER:
+                    alpha = max(alpha, score)
+                elif bound == UPPER:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        plies = self.plies(board, side, hint)
+        if not plies:
+            # No legal move: the battle is over and decided on material,
+            # as in Gameboard.result()'s 'no-move' terminal.
+            return self.evaluate(board, side)
+
+        original_alpha = alpha
+        best, best_ply = -WIN_SCORE - 1, None
+        for ply in plies:
+            board.push(ply)
+            try:
+                score = -self.negamax(board, _other(side), depth - 1, -beta, -alpha)
+            finally:
+                board.pop()
+            if score > best:
+                best, best_ply = score, ply
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                self._hints(board).cutoff(ply, depth)
+                break
+
+        if best <= original_alpha:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, best, depth, bound, pack_move(best_ply))
+        return best
+
+    def best_move(self, board, side, depth=None):
+        """Return ``(ply, score)``: ``side``'s best ply on ``board`` and its
+        negamax score. ``board`` is left as it was found.
+
+        Raises ``NoMoveException`` if ``side`` has no legal ply.
+        """
+        depth = self.depth if depth is None else depth
+        self.nodes += 1
+        entry = self.tt.probe(self._key(board, side))
+        plies = self.plies(board, side, entry[3] if entry else 0)
+        if not plies:
+            raise NoMoveException(side)
+
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_ply = plies[0]
+        for ply in plies:
+            board.push(ply)
+            try:
+                score = -self.negamax(board, _other(side), depth - 1, -beta, -alpha)
+            finally:
+                board.pop()
+            if score > alpha:
+                alpha, best_ply = score, ply
+        self.tt.store(self._key(board, side), alpha, depth, EXACT,
+                      pack_move(best_ply))
+        return best_ply, alpha
+
+    def iterative_deepening(self, board, side, time_budget_ms, max_depth=MAX_DEPTH):
+        """Deepen one ply at a time until ``time_budget_ms`` runs out.
+
+        Returns ``(ply, score)`` from the deepest *completed* iteration; the
+        iteration in flight when the deadline passes is thrown away (its
+        pushes are unwound on the way out). Each iteration starts from the
+        previous best move via the table, so little work is repeated. If
+        not even depth 1 finishes, the first ordered ply is returned with a
+        score of None. The deadline is checked at every node, so the
+        overshoot is at most one node's move generation.
+
+        ``completed_depth`` records how deep the answer was searched.
+        Raises ``NoMoveException`` if ``side`` has no legal ply.
+        """
+        self._deadline = time.perf_counter() + time_budget_ms / 1000.0
+        self.completed_depth = 0
+        plies = self.plies(board, side)
+        if not plies:
+            self._deadline = None
+            raise NoMoveException(side)
+        best = (plies[0], None)
+        try:
+            for depth in range(1, max_depth + 1):
+                best = self.best_move(board, side, depth)
+                self.completed_depth = depth
+                if len(plies) == 1 or abs(best[1]) >= WIN_SCORE:
+                    break
+        except SearchTimeout:
+            pass
+        finally:
+            self._deadline = None
+        return best
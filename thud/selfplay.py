@@ -9,23 +9,40 @@ outcome, so a game can never hang. Move selection is deterministic for a given
     from thud import selfplay
     r = selfplay.play_game('classic', seed=0)
     # -> {'winner': 'troll', 'score': 20, 'reason': 'win', 'plies': 62, ...}
+
+Sets of games can be farmed out to a process pool, one seed per task;
+results stream back as games finish. From the shell::
+
+    python -m thud.selfplay --games 1000 --workers 32 --ruleset classic
+
+``--out DIR`` also streams every game to rotating shard files
+(:mod:`thud.shards`) as it arrives, for long runs feeding training jobs.
 """
 
-from . import ai_engine
+import argparse
+import concurrent.futures
+import json
+import sys
+import time
+
+from . import ai_engine, parallel, shards
 from .ai_engine import AIEngine
-from .gameboard import DEFAULT_MAX_PLIES, Gameboard
+from .gameboard import (DEFAULT_MAX_PLIES, DEFAULT_MAX_QUIET_PLIES,
+                        DEFAULT_MAX_REPETITIONS, Gameboard)
 from .ply import NoMoveException
 
 
 def play_game(ruleset='classic', seed=None, max_plies=DEFAULT_MAX_PLIES,
-              lookahead=0):
+              lookahead=0, max_repetitions=DEFAULT_MAX_REPETITIONS,
+              max_quiet_plies=DEFAULT_MAX_QUIET_PLIES):
     """Play one AI-vs-AI game; return a scored result dict.
 
-    Returns ``{'winner', 'score', 'reason', 'plies', 'ply_list'}``. The first
-    three come from :meth:`Gameboard.result`: winner is
+    Returns ``{'winner', 'score', 'reason', 'plies', 'ply_list', 'seed',
+    'ruleset'}``. The first three come from :meth:`Gameboard.result`: winner is
     'dwarf' / 'troll' / 'draw', score is the troll-perspective material
     differential (``4*trolls - dwarfs``), reason is 'win' / 'no-move' /
-    'cutoff'. Deterministic for a fixed ``seed``.
+    'repetition' / 'cutoff'. The three limits are passed to ``result``.
+    Deterministic for a fixed ``seed``.
     """
     if seed is not None:
         ai_engine.seed(seed)
@@ -33,10 +50,11 @@ def play_game(ruleset='classic', seed=None, max_plies=DEFAULT_MAX_PLIES,
 
     def finish(term):
         return {**term, 'plies': len(board.ply_list),
-                'ply_list': list(board.ply_list)}
+                'ply_list': list(board.ply_list), 'seed': seed,
+                'ruleset': ruleset}
 
     while True:
-        term = board.result(max_plies=max_plies)
+        term = board.result(max_plies, max_repetitions, max_quiet_plies)
         if term:
             return finish(term)
         side = board.turn_to_act()
@@ -50,10 +68,111 @@ def play_game(ruleset='classic', seed=None, max_plies=DEFAULT_MAX_PLIES,
         board.ply_list.append(ply)
 
 
-def play_set(games=10, ruleset='classic', base_seed=0, **kw):
+def _play_seed(kw):
+    # Pool task: a top-level function so it pickles.
+    return play_game(**kw)
+
+
+def iter_games(games=10, ruleset='classic', base_seed=0, workers=None, **kw):
+    """Yield :func:`play_game` results for seeds ``base_seed..base_seed+games-1``.
+
+    Serially and in seed order by default. With ``workers``, seeds are
+    farmed across that many processes (the shared :mod:`thud.parallel`
+    pool) and each result is yielded as soon as its game finishes, so the
+    order varies but every game is the one its ``seed`` key names. At most
+    two games per worker are in flight, keeping memory flat however many
+    games are asked for.
+    """
+    tasks = ({'ruleset': ruleset, 'seed': base_seed + i, **kw}
+             for i in range(games))
+    if not workers:
+        for task in tasks:
+            yield play_game(**task)
+        return
+    pool = parallel.get_pool(workers)
+    pending = set()
+    for task in tasks:
+        pending.add(pool.submit(_play_seed, task))
+        if len(pending) >= 2 * workers:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in done:
+                yield f.result()
+    for f in concurrent.futures.as_completed(pending):
+        yield f.result()
+
+
+def play_set(games=10, ruleset='classic', base_seed=0, workers=None, **kw):
     """Play ``games`` games with seeds ``base_seed..base_seed+games-1``.
 
-    Returns a list of result dicts from :func:`play_game`.
+    Returns a list of result dicts from :func:`play_game`, in seed order
+    (``workers`` plays them in parallel; see :func:`iter_games`).
     """
-    return [play_game(ruleset=ruleset, seed=base_seed + i, **kw)
-            for i in range(games)]
+    results = iter_games(games, ruleset, base_seed, workers, **kw)
+    return sorted(results, key=lambda r: r['seed'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m thud.selfplay',
+        description='Headless AI-vs-AI games; one JSON summary line per game.')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--ruleset', choices=('classic', 'kvt', 'klash'),
+                        default='classic')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first game (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes to farm games across (default: serial)')
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES)
+    parser.add_argument('--max-repetitions', type=int,
+                        default=DEFAULT_MAX_REPETITIONS,
+                        help='end a game when a position occurs this often '
+                             '(default: %(default)s)')
+    parser.add_argument('--max-quiet-plies', type=int,
+                        default=DEFAULT_MAX_QUIET_PLIES,
+                        help='end a game after this many plies without a '
+                             'capture (default: %(default)s)')
+    parser.add_argument('--lookahead', type=int, default=0)
+    parser.add_argument('--out', metavar='DIR',
+                        help='also write games to shards in DIR')
+    parser.add_argument('--format', choices=sorted(shards.FORMATS),
+                        default='jsonl', help='shard format (default: %(default)s)')
+    parser.add_argument('--shard-games', type=int,
+                        default=shards.DEFAULT_GAMES_PER_SHARD,
+                        help='games per shard (default: %(default)s)')
+    parser.add_argument('--fsync-every', type=int,
+                        default=shards.DEFAULT_FSYNC_EVERY,
+                        help='games between fsyncs (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    ai_engine.ai_log.disabled = True
+    start = time.perf_counter()
+    total = 0
+    writer = None
+    if args.out:
+        writer = shards.ShardWriter(args.out, prefix=args.ruleset, fmt=args.format,
+                                    games_per_shard=args.shard_games,
+                                    fsync_every=args.fsync_every)
+    try:
+        for r in iter_games(args.games, args.ruleset, args.seed, args.workers,
+                            max_plies=args.max_plies, lookahead=args.lookahead,
+                            max_repetitions=args.max_repetitions,
+                            max_quiet_plies=args.max_quiet_plies):
+            total += r['plies']
+            if writer:
+                writer.write(r)
+            print(json.dumps({k: r[k] for k in
+                              ('seed', 'winner', 'score', 'reason', 'plies')}))
+    finally:
+        if writer:
+            writer.close()
+        parallel.shutdown()
+    elapsed = time.perf_counter() - start
+    print('{} games, {} plies in {:.1f}s ({:.0f} plies/sec)'.format(
+        args.games, total, elapsed, total / elapsed if elapsed else 0),
+        file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Streaming self-play output: finished games to rotating shard files.
+
+A :class:`ShardWriter` takes :func:`thud.selfplay.play_game` results one at
+a time and appends them to the current shard, so a run of any length holds
+only the game in hand. Shards are written as ``<name>.tmp`` and renamed into
+place once full (or when the writer closes), so a training job that picks
+up ``*.jsonl`` / ``*.bin`` only ever sees complete shards while generation
+carries on. Every ``fsync_every`` games the shard is flushed and fsynced;
+a crash loses at most that many games.
+
+Two formats:
+
+``jsonl``
+    One JSON object per line: ``seed``, ``ruleset``, ``winner``, ``score``,
+    ``reason``, ``plies`` and ``moves`` (plies in .thud notation).
+
+``bin``
+    ``MAGIC``, then one record per game: a little-endian ``HEADER``
+    (seed, ruleset, winner, reason, score, ply count; seed -1 for an
+    unseeded game) followed by one uint32 move code per ply
+    (:meth:`Ply.to_code <thud.ply.Ply.to_code>`).
+
+:func:`read_shard` reads either back as result dicts with a ``ply_list``.
+"""
+
+import json
+import os
+import struct
+import sys
+from array import array
+
+from .ply import Ply
+
+
+MAGIC = b'THUDSHD1'
+HEADER = struct.Struct('<qBBBhH')
+FORMATS = {'jsonl': '.jsonl', 'bin': '.bin'}
+DEFAULT_GAMES_PER_SHARD = 10000
+DEFAULT_FSYNC_EVERY = 100
+
+# Enum fields of the binary header, by index.
+RULESETS = ('classic', 'kvt', 'klash')
+WINNERS = ('dwarf', 'troll', 'draw')
+REASONS = ('win', 'no-move', 'cutoff', 'repetition')
+
+
+def _jsonl_record(result):
+    return (json.dumps({'seed': result.get('seed'),
+                        'ruleset': result['ruleset'],
+                        'winner': result['winner'],
+                        'score': result['score'],
+                        'reason': result['reason'],
+                        'plies': result['plies'],
+                        'moves': Ply.format_many(result['ply_list'])})
+            + '\n').encode('utf-8')
+
+
+def _bin_record(result):
+    seed = result.get('seed')
+    moves = array('I', (p.to_code() for p in result['ply_list']))
+    if sys.byteorder == 'big':
+        moves.byteswap()
+    return HEADER.pack(-1 if seed is None else seed,
+                       RULESETS.index(result['ruleset']),
+                       WINNERS.index(result['winner']),
+                       REASONS.index(result['reason']),
+                       result['score'], len(moves)) + moves.tobytes()
+
+
+class ShardWriter:
+    """Append self-play results to rotating shards in ``directory``.
+
+    Shards are named ``<prefix>-00000.jsonl``, ``<prefix>-00001.jsonl``, ...
+    (``.bin`` for the binary format), ``games_per_shard`` games each. Use as
+    a context manager, or call :meth:`close` to finish the last shard.
+    """
+
+    def __init__(self, directory, prefix='selfplay', fmt='jsonl',
+                 games_per_shard=DEFAULT_GAMES_PER_SHARD,
+                 fsync_every=DEFAULT_FSYNC_EVERY):
+        if fmt not in FORMATS:
+            raise ValueError("unknown shard format: {!r}".format(fmt))
+        self.directory = directory
+        self.prefix = prefix
+        self.fmt = fmt
+        self.games_per_shard = games_per_shard
+        self.fsync_every = fsync_every
+        self.shards = []
+        self._file = None
+        self._path = None
+        self._games = 0
+        self._unsynced = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self):
+        name = '{}-{:05d}{}'.format(self.prefix, len(self.shards), FORMATS[self.fmt])
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path + '.tmp', 'wb')
+        self._games = 0
+        if self.fmt == 'bin':
+            self._file.write(MAGIC)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _finish(self):
+        self._sync()
+        self._file.close()
+        os.replace(self._path + '.tmp', self._path)
+        self.shards.append(self._path)
+        self._file = None
+
+    def write(self, result):
+        """Append one game; rotates and fsyncs as configured."""
+        if self._file is None:
+            self._open()
+        record = _bin_record(result) if self.fmt == 'bin' else _jsonl_record(result)
+        self._file.write(record)
+        self._games += 1
+        self._unsynced += 1
+        if self._games >= self.games_per_shard:
+            self._finish()
+        elif self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def close(self):
+        """Finish the shard in progress, if any."""
+        if self._file is not None:
+            self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_shard(path):
+    """Yield the games in a finished shard as result dicts.
+
+    Each has the keys written (``seed``, ``ruleset``, ``winner``, ``score``,
+    ``reason``, ``plies``) plus a ``ply_list`` of :class:`~thud.ply.Ply`.
+    """
+    if path.endswith(FORMATS['jsonl']):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                game = json.loads(line)
+                game['ply_list'] = Ply.parse_many(game.pop('moves'))
+                yield game
+        return
+
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not a self-play shard: {!r}".format(path))
+        while True:
+            header = f.read(HEADER.size)
+            if not header:
+                return
+            seed, ruleset, winner, reason, score, plies = HEADER.unpack(header)
+            moves = array('I')
+            moves.frombytes(f.read(4 * plies))
+            if sys.byteorder == 'big':
+                moves.byteswap()
+            yield {'seed': None if seed < 0 else seed,
+                   'ruleset': RULESETS[ruleset], 'winner': WINNERS[winner],
+                   'reason': REASONS[reason], 'score': score, 'plies': plies,
+                   'ply_list': [Ply.from_code(m) for m in moves]}
@@ -0,0 +1,151 @@
+"""TranspositionTable — bounded cache of evaluated positions.
+
+Keyed by ``Gameboard.zobrist``. Each entry records a score, the depth it
+was searched to, what kind of bound the score is, and the best move found
+there. Storage is two flat ``array('Q')`` columns (key word, packed data
+word) sized from a megabyte budget, so memory stays fixed no matter how
+long a self-play run goes.
+
+Slots are grouped in buckets of two: the first is *depth-preferred* (only
+replaced by an equal-or-deeper result, so expensive entries survive), the
+second is *always-replace* (so fresh shallow results still get cached).
+"""
+
+from array import array
+
+from .ply import Ply
+
+
+# Bound types: the stored score is exact, a lower bound (fail-high) or an
+# upper bound (fail-low).
+EXACT, LOWER, UPPER = 0, 1, 2
+
+DEFAULT_MB = 8
+# One 64-bit key word plus one 64-bit data word.
+ENTRY_BYTES = 16
+
+# Data word layout: | score+2^15 : 16 | valid : 1 | bound : 2 | depth : 8 | move : 32 |
+_MOVE_BITS = 32
+_DEPTH_SHIFT = 32
+_BOUND_SHIFT = 40
+_VALID = 1 << 42
+_SCORE_SHIFT = 48
+_SCORE_BIAS = 1 << 15
+
+
+def pack_move(ply):
+    """``ply``'s move code (:meth:`Ply.to_code`) without its captures.
+
+    Captures are not stored; a table move is a hint to be matched against
+    freshly generated plies, never replayed blind. ``None`` packs as 0.
+    """
+    if not ply:
+        return 0
+    return Ply.encode(ply.token, ply.origin, ply.dest)
+
+
+class TranspositionTable:
+    """Fixed-size two-slot-bucket transposition table."""
+
+    def __init__(self, mb=DEFAULT_MB):
+        self.resize(mb)
+
+    def resize(self, mb):
+        """Reallocate for a ``mb`` megabyte budget (clears every entry).
+
+        The bucket count is rounded down to a power of two so the index is
+        a mask of the key.
+        """
+        buckets = max(1, (int(mb * (1 << 20)) // ENTRY_BYTES) // 2)
+        buckets = 1 << (buckets.bit_length() - 1)
+        self._mask = buckets - 1
+        self._keys = array('Q', bytes(8 * 2 * buckets))
+        self._data = array('Q', bytes(8 * 2 * buckets))
+        self.reset_stats()
+
+    def clear(self, stats=True):
+        """Drop every entry, keeping the budget; ``stats=False`` also keeps
+        the counters (e.g. when a new game empties the table).
+
+        The columns are zeroed in place rather than reallocated, and not at
+        all if nothing was stored since the last clear.
+        """
+        if self.stores != self._stores_at_clear:
+            # Only the data words carry the valid bit.
+            data = memoryview(self._data).cast('B')
+            data[:] = bytes(len(data))
+        if stats:
+            self.reset_stats()
+        self._stores_at_clear = self.stores
+
+    def reset_stats(self):
+        """Zero the hit/miss/store/overwrite counters."""
+        self.hits = self.misses = self.stores = self.overwrites = 0
+        self._stores_at_clear = 0
+
+    def size_mb(self):
+        return len(self._keys) * ENTRY_BYTES / (1 << 20)
+
+    def probe(self, key, depth=None):
+        """Return ``(score, depth, bound, move)`` stored for ``key``, or None.
+
+        With ``depth``, only an entry stored at exactly that depth is
+        returned (and counted as a hit); for caches whose result at
+        another depth is a different value, not a bound.
+        """
+        i = (key & self._mask) << 1
+        for slot in (i, i + 1):
+            data = self._data[slot]
+            if data & _VALID and self._keys[slot] == key:
+                if depth is not None and (data >> _DEPTH_SHIFT) & 0xff != depth:
+                    continue  # the other slot may hold it at this depth
+                self.hits += 1
+                return ((data >> _SCORE_SHIFT) - _SCORE_BIAS,
+                        (data >> _DEPTH_SHIFT) & 0xff,
+                        (data >> _BOUND_SHIFT) & 0x3,
+                        data & ((1 << _MOVE_BITS) - 1))
+        self.misses += 1
+        return None
+
+    def store(self, key, score, depth, bound=EXACT, move=0):
+        """Record a result for ``key``. ``score`` must be an int.
+
+        A result shallower than one already held for ``key`` is dropped.
+        Otherwise it goes in the depth-preferred slot if that slot holds
+        the same key, is empty, or was searched no deeper, and in the
+        always-replace slot if not; a copy of ``key`` left in the other
+        slot is cleared, so a bucket holds at most one. Scores are clamped
+        to the 16-bit field.
+        """
+        depth = min(depth, 0xff)
+        i = (key & self._mask) << 1
+        keys, column = self._keys, self._data
+        for slot in (i, i + 1):
+            old = column[slot]
+            if (old & _VALID and keys[slot] == key
+                    and depth < (old >> _DEPTH_SHIFT) & 0xff):
+                return
+        score = max(-_SCORE_BIAS, min(_SCORE_BIAS - 1, int(score)))
+        data = (((score + _SCORE_BIAS) << _SCORE_SHIFT) | _VALID
+                | (bound << _BOUND_SHIFT) | (depth << _DEPTH_SHIFT)
+                | (move & ((1 << _MOVE_BITS) - 1)))
+        old = column[i]
+        if (not old & _VALID or keys[i] == key
+                or depth >= (old >> _DEPTH_SHIFT) & 0xff):
+            slot, other = i, i + 1
+        else:
+            slot, other = i + 1, i
+            old = column[slot]
+        if old & _VALID and keys[slot] != key:
+            self.overwrites += 1
+        if keys[other] == key:
+            column[other] = 0
+        keys[slot] = key
+        column[slot] = data
+        self.stores += 1
+
+    def stats(self):
+        """Counters for sizing the table: hits, misses, stores, overwrites."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'stores': self.stores, 'overwrites': self.overwrites,
+                'entries': len(self._keys), 'mb': self.size_mb()}
@@ -0,0 +1,73 @@
+"""Zobrist keys — a 64-bit position hash for Gameboard.
+
+Every (piece kind, square) pair gets a fixed random 64-bit word; a
+position's key is the XOR of the words for every piece on the board, plus
+a side-to-move word when the troll is up and a word for the klash
+materialized-troll count. Because XOR is its own inverse, making a move
+only has to XOR out the squares that emptied and XOR in the ones that
+filled, so ``Gameboard.apply_ply`` keeps the key current in a handful of
+int operations instead of rehashing three 289-bit boards.
+
+The words come from a fixed-seed generator, so a key is stable across
+processes and runs (self-play shards from different workers can be
+deduplicated on it).
+"""
+
+import random
+
+from .bitboard import Bitboard
+
+
+_rng = random.Random(0x54687564)
+
+PIECES = {kind: tuple(_rng.getrandbits(64) for _ in range(Bitboard.N))
+          for kind in ('dwarf', 'troll', 'thudstone')}
+SIDE = _rng.getrandbits(64)
+# Indexed by klash_trolls; the count never legitimately exceeds
+# KLASH_TROLL_LIMIT, the spare entries only keep add_troll total.
+KLASH = tuple(_rng.getrandbits(64) for _ in range(16))
+# Rules state the position key leaves out (see rules_key). Drawn after the
+# words above so those stay the same.
+RULESETS = {name: _rng.getrandbits(64) for name in ('classic', 'kvt', 'klash')}
+KVT_JUMP = _rng.getrandbits(64)
+
+
+def toggle(table, diff):
+    """XOR of ``table`` words for every position set in the raw int ``diff``.
+
+    ``diff`` is the XOR of a bitboard's value before and after a move, i.e.
+    exactly the squares that changed, so this is cheap for a single ply.
+    """
+    key = 0
+    while diff:
+        bit = diff.bit_length() - 1
+        key ^= table[Bitboard.N - 1 - bit]
+        diff ^= 1 << bit
+    return key
+
+
+def board_key(board):
+    """Compute ``board``'s key from scratch (the incremental key's reference)."""
+    key = (toggle(PIECES['dwarf'], board.dwarfs.value)
+           ^ toggle(PIECES['troll'], board.trolls.value)
+           ^ toggle(PIECES['thudstone'], board.thudstone.value)
+           ^ KLASH[board.klash_trolls % len(KLASH)])
+    if board.turn_to_act() == 'troll':
+        key ^= SIDE
+    return key
+
+
+def rules_key(board):
+    """Word for the rules state ``board``'s key leaves out: its ruleset, and
+    in KVT whether the last ply was a troll capture (after which trolls may
+    only capture again).
+
+    XOR it into the key for caches shared across games and rulesets, where
+    the same layout under other rules has other moves.
+    """
+    key = RULESETS[board.ruleset]
+    if board.ruleset == 'kvt' and board.ply_list:
+        last = board.ply_list[-1]
+        if last.token == 'troll' and last.captured:
+            key ^= KVT_JUMP
+    return key